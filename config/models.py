@@ -1,5 +1,73 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class GalaxyShape(BaseModel):
+    """Which hexes of the grid clusters are seeded on, and how often."""
+
+    kind: Literal["round", "spiral", "ring", "cores"] = "round"
+    # hexes whose weight falls below this aren't used at all. weights top out at
+    # 1, so anything from there up would leave nothing
+    cutoff: float = Field(0.05, ge=0, lt=1)
+    # how wide arms, rings and cores are, as a fraction of the grid's radius
+    width: float = Field(0.15, gt=0)
+    arms: int = Field(2, ge=1)
+    # how far the arms wind round, in radians from the middle to the rim
+    twist: float = 3.0
+    # distance of the ring, or of the cores, from the middle
+    ring_radius: float = Field(0.6, ge=0, le=1)
+    cores: int = Field(3, ge=1)
+    # turns the whole shape, in radians
+    rotation: float = 0.0
+
+
+class QualityThresholds(BaseModel):
+    """Limits a seed has to stay within; generation is abandoned as soon as one
+    can't be met anymore. Unset limits aren't checked."""
+
+    # fraction of clusters with only one sector
+    max_single_sector_cluster_ratio: float | None = None
+    # distance of the sectors' centre of mass from the middle of the grid,
+    # as a fraction of the grid's radius
+    max_layout_offset: float | None = None
+    # groups of clusters that can't reach each other by gate (1 = all connected)
+    max_disconnected_groups: int | None = None
+
+
+class RegionSettings(BaseModel):
+    """Asteroid fields and nebulas are laid out by noise fields over the galaxy."""
+
+    # metres per noise lattice cell; bigger means bigger patches of similar space
+    noise_scale: float = Field(1_000_000, gt=0)
+    octaves: int = Field(3, ge=1)
+    # noise values above these get an asteroid field/nebula. noise sits around 0.5
+    asteroid_threshold: float = 0.5
+    nebula_threshold: float = 0.65
+    # random if not set
+    seed: int | None = None
 
 
 class Config(BaseModel):
     sector_count: int
+    # folder holding the vanilla galaxy.xml/clusters.xml/sectors.xml to start from
+    vanilla_maps_location: str | None = None
+    # vanilla clusters to keep, e.g. faction home clusters. keeps all if not set
+    vanilla_cluster_ids: list[int] | None = None
+    # write diff patches against the vanilla maps instead of replacing them.
+    # required with vanilla maps, since we only read part of what's in them
+    export_diff: bool = False
+    quality: QualityThresholds = QualityThresholds()
+    shape: GalaxyShape = GalaxyShape()
+    # factions that get a home sector and a territory around it, e.g.
+    # [argon, paranid, teladi]. sector ownership is left alone if empty
+    factions: list[str] = []
+    regions: RegionSettings = RegionSettings()
+
+    @model_validator(mode="after")
+    def check_vanilla_export(self) -> "Config":
+        # replacing the maps outright would write imported clusters back out with
+        # only what we read of them, losing their zones, regions and gate paths
+        if self.vanilla_maps_location is not None and not self.export_diff:
+            raise ValueError("vanilla_maps_location needs export_diff: true")
+        return self
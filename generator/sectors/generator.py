@@ -1,18 +1,19 @@
+import math
 import random
-from typing import cast
 
+import numpy as np
 
 from config.models import Config
 from generator.sectors.helpers import (
     break_compound_id,
-    check_for_connection,
     convert_km_to_m_galaxy_scale,
-    count_connections,
     distance_between_points,
     get_directional_position_from_pair_both,
     get_location_in_sector_from_cluster_both,
+    snap_to_hex_lattice,
 )
 from generator.sectors.models import (
+    ChangeSet,
     Cluster,
     Galaxy,
     Hex,
@@ -22,8 +23,20 @@ from generator.sectors.models import (
     Position,
     Sector,
 )
+from generator.sectors.placement import PlacementEngine
+from generator.sectors.regions import assign_regions
+from generator.sectors.scoring import GenerationProgress, SeedScorer
+from generator.sectors.shapes import shape_weights
+from generator.sectors.territory import assign_territories
 
 BASE_CHANCE_FOR_MULTIPLE_CLUSTER_CONNECTIONS = 0.75
+# smallest grid we'll build, so small galaxies still have room to spread out
+HEX_GRID_SIZE = 200
+# hexes per sector on bigger grids, so the last clusters still find a spot
+HEX_GRID_SLACK = 1.5
+# how far a shaped grid may grow looking for enough usable hexes, as a multiple
+# of the rings a round grid of the same size needs
+MAX_GRID_RINGS_FACTOR = 6
 STANDARD_RADIUS = 250_000
 
 
@@ -33,137 +46,318 @@ class SectorGenerationException(Exception):
 
 
 class SectorGenerator:
-    def __init__(self, config: Config, galaxy: Galaxy) -> None:
+    def __init__(
+        self,
+        config: Config,
+        galaxy: Galaxy,
+        *,
+        occupied_hexes: set[Hex] | None = None,
+        scorer: SeedScorer | None = None,
+    ) -> None:
         self.config = config
         self.galaxy = galaxy
         self.hex_grid: set[Hex] = set()
+        self.grid_radius = 0.0
+        self.scorer = scorer or SeedScorer.from_config(config)
+        # hexes already claimed by a pre-populated galaxy (e.g. imported vanilla
+        # clusters). compared by rounded position since the imported hexes are
+        # snapped onto the grid rather than walked out from the origin
+        self.occupied_positions: set[Position] = {
+            Position.round(hex.center) for hex in occupied_hexes or set()
+        }
+        self.placement = PlacementEngine(set(), set())
+        # kept so clusters that are redone later get regions from the same noise
+        self.region_seed: int | None = None
 
     def generate(self) -> None:
-        """Generate clusters with 1-3 sectors each, until we reach the sector cap."""
+        """Generate clusters with 1-3 sectors each, until we reach the sector cap.
+
+        If the galaxy is pre-populated, its sectors count towards the cap and new
+        clusters are placed around them.
+
+        Raises `SeedRejectedException` as soon as the galaxy can no longer meet the
+        configured quality thresholds."""
         self._generate_hex_grid()
         self._generate_clusters_and_sectors()
         self._generate_cluster_highways()
         self._generate_sector_highways()
+        self._generate_territories()
+        self._generate_regions()
+
+    def _generate_territories(self) -> None:
+        if len(self.config.factions) > 0:
+            self.galaxy.territory = assign_territories(
+                self.galaxy, self.config.factions
+            )
+
+    def _generate_regions(self) -> None:
+        if self.region_seed is None:
+            self.region_seed = (
+                self.config.regions.seed
+                if self.config.regions.seed is not None
+                else random.randrange(2**31)
+            )
+        assign_regions(self.galaxy.cluster_list, self.config.regions, self.region_seed)
+
+    def _usable_hex_count(self) -> int:
+        if self.config.shape.kind == "round":
+            return len(self.hex_grid)
+        weights = shape_weights(
+            self.config.shape,
+            np.array([hex.center.x for hex in self.hex_grid], dtype=float),
+            np.array([hex.center.z for hex in self.hex_grid], dtype=float),
+        )
+        return int(np.count_nonzero(weights))
 
     def _generate_hex_grid(self) -> None:
         new_hexes: set[Hex] = {Hex(center=Position(0, 0, 0))}
-        # TODO make this number based on the number of sectors in the config
-        while len(self.hex_grid) < 200:
+        size = max(HEX_GRID_SIZE, math.ceil(self.config.sector_count * HEX_GRID_SLACK))
+        # a round grid of n rings has 3n(n + 1) + 1 hexes
+        round_rings = math.ceil((math.sqrt(12 * size - 3) - 3) / 6)
+        max_rings = round_rings * MAX_GRID_RINGS_FACTOR
+        # shaped galaxies leave some of the grid out, so keep going until
+        # there's as much room as a round one would have
+        rings = 0
+        while self._usable_hex_count() < size:
+            if rings == max_rings:
+                raise SectorGenerationException(
+                    f"Galaxy shape leaves fewer than {size} usable hexes"
+                    f" in {max_rings} rings"
+                )
+            rings += 1
             hexes_to_add: set[Hex] = set()
             for hex in new_hexes:
                 # for every recently added hex, populate its neighbors.
-                # we don't have to worry about dupes since we're using sets
-                hexes_to_add.update([Hex(center=x) for x in hex.neighbor_positions])
+                # we don't have to worry about dupes since we're using sets, as long
+                # as every path to a hex lands on the same centre, so work those out
+                # from the lattice rather than by adding up steps
+                hexes_to_add.update(
+                    [
+                        Hex(
+                            center=Position.round(
+                                snap_to_hex_lattice(x, STANDARD_RADIUS)
+                            )
+                        )
+                        for x in hex.neighbor_positions
+                    ]
+                )
+            new_hexes = hexes_to_add - self.hex_grid
             self.hex_grid.update(hexes_to_add)
-            new_hexes = {*hexes_to_add}
+        # the galaxy is flat on x/z, so y doesn't come into it
+        self.grid_radius = max(
+            math.hypot(hex.center.x, hex.center.z) for hex in self.hex_grid
+        )
+        self.placement = PlacementEngine(
+            self.hex_grid,
+            self.occupied_positions | {sec.position for sec in self.galaxy.sector_list},
+            radius=STANDARD_RADIUS,
+            shape=self.config.shape,
+        )
+
+    def _get_progress(self, highways_done: bool = False) -> GenerationProgress:
+        return GenerationProgress(
+            remaining_sectors=max(
+                0, self.config.sector_count - self.galaxy.sector_count
+            ),
+            grid_radius=self.grid_radius,
+            highways_done=highways_done,
+        )
 
     def _generate_cluster_highways(self) -> None:
+        # pairs already joined and gates per cluster, kept up to date as we go
+        # instead of rescanning every highway for every pair of clusters
+        connected: set[tuple[int, int]] = set()
+        connection_counts: dict[int, int] = {}
+        for highway in self.galaxy.highways:
+            self.scorer.on_highway(highway)
+            self._track_highway(highway, connected, connection_counts)
+
+        positions = {x.id: x.position for x in self.galaxy.cluster_list}
         for cluster in self.galaxy.cluster_list:
             # order other clusters by distance and join a few nearby ones
             # that don't already have a connection to the one we're looking at
             siblings = sorted(
                 self.galaxy.get_cluster_siblings(cluster),
                 key=lambda x: distance_between_points(
-                    x.position, cast(Position, cluster.position)
+                    positions[x.id], positions[cluster.id]
                 ),
             )
 
             for sib in siblings:
-                ids = [x.id for x in self.galaxy.highways]
-                if not check_for_connection(cluster.id, sib.id, ids):
-                    connection_count = count_connections(cluster.id, ids)
-                    if connection_count == 0:
-                        entry_point, exit_point = (
-                            get_location_in_sector_from_cluster_both(cluster, sib)
-                        )
-                        highway = InterClusterConnector(
-                            entry_point=entry_point,
-                            exit_point=exit_point,
-                            entry_cluster=cluster,
-                            exit_cluster=sib,
-                        )
-                        self.galaxy.highways.append(highway)
-                    else:
-                        chance = (
-                            BASE_CHANCE_FOR_MULTIPLE_CLUSTER_CONNECTIONS
-                            / connection_count**2
+                if (min(cluster.id, sib.id), max(cluster.id, sib.id)) in connected:
+                    continue
+                connection_count = connection_counts.get(cluster.id, 0)
+                if connection_count > 0:
+                    chance = (
+                        BASE_CHANCE_FOR_MULTIPLE_CLUSTER_CONNECTIONS
+                        / connection_count**2
+                    )
+                    if random.random() > chance:
+                        continue
+                highway = self._connect_clusters(cluster, sib)
+                self.galaxy.highways.append(highway)
+                self.scorer.on_highway(highway)
+                self._track_highway(highway, connected, connection_counts)
+
+        self.scorer.check(self._get_progress(highways_done=True))
+
+    @staticmethod
+    def _track_highway(
+        highway: InterClusterConnector,
+        connected: set[tuple[int, int]],
+        connection_counts: dict[int, int],
+    ) -> None:
+        a, b = break_compound_id(highway.id)
+        connected.add((min(a, b), max(a, b)))
+        for cluster_id in {a, b}:
+            connection_counts[cluster_id] = connection_counts.get(cluster_id, 0) + 1
+
+    def _connect_clusters(
+        self, cluster: Cluster, sib: Cluster
+    ) -> InterClusterConnector:
+        entry_point, exit_point = get_location_in_sector_from_cluster_both(cluster, sib)
+        return InterClusterConnector(
+            entry_point=entry_point,
+            exit_point=exit_point,
+            entry_cluster=cluster,
+            exit_cluster=sib,
+        )
+
+    def _generate_sector_highways_for_cluster(self, cluster: Cluster) -> None:
+        if len(cluster.sectors) > 1:
+            for sector in cluster.sectors.values():
+                # if the target sector has no connections, connect it to one of its siblings
+                if not any(
+                    [
+                        sector.id in break_compound_id(x.id)
+                        for x in cluster.inter_sector_highways
+                    ]
+                ):
+                    max_gate_distance = convert_km_to_m_galaxy_scale(800)
+                    partner = random.choice(cluster.get_sector_siblings(sector))
+                    main_gate_pos, partner_gate_pos = (
+                        get_directional_position_from_pair_both(
+                            sector.position, partner.position, max_gate_distance
                         )
-                        if random.random() <= chance:
-                            entry_point, exit_point = (
-                                get_location_in_sector_from_cluster_both(cluster, sib)
-                            )
-                            highway = InterClusterConnector(
-                                entry_point=entry_point,
-                                exit_point=exit_point,
-                                entry_cluster=cluster,
-                                exit_cluster=sib,
-                            )
-                            self.galaxy.highways.append(highway)
+                    )
+                    highway = InterSectorConnector(
+                        entry_point=LocationInSector(
+                            sector=sector, position=main_gate_pos
+                        ),
+                        exit_point=LocationInSector(
+                            sector=partner, position=partner_gate_pos
+                        ),
+                    )
+                    cluster.inter_sector_highways.append(highway)
 
     def _generate_sector_highways(self) -> None:
         # TODO refactor this to use galaxy.sector_list if possible
         for cluster in self.galaxy.clusters.values():
-            if len(cluster.sectors) > 1:
-                for sector in cluster.sectors.values():
-                    # if the target sector has no connections, connect it to one of its siblings
-                    if not any(
-                        [
-                            sector.id in break_compound_id(x.id)
-                            for x in cluster.inter_sector_highways
-                        ]
-                    ):
-                        max_gate_distance = convert_km_to_m_galaxy_scale(800)
-                        partner = random.choice(cluster.get_sector_siblings(sector))
-                        main_gate_pos, partner_gate_pos = (
-                            get_directional_position_from_pair_both(
-                                sector.position, partner.position, max_gate_distance
-                            )
-                        )
-                        highway = InterSectorConnector(
-                            entry_point=LocationInSector(
-                                sector=sector, position=main_gate_pos
-                            ),
-                            exit_point=LocationInSector(
-                                sector=partner, position=partner_gate_pos
-                            ),
-                        )
-                        cluster.inter_sector_highways.append(highway)
-
-    def _get_position_for_sector(self, cluster: Cluster) -> Position:
-        # breakpoint()
-        if cluster.sector_count == 0:
-            while True:
-                # breakpoint()
-                hex = random.choice(list(self.hex_grid))
-                if hex.center not in [
-                    sec.hex.center for sec in self.galaxy.sector_list
-                ]:
-                    return hex.center
-        potential_positions: set[Position] = set(
-            [pos for sec in cluster.sector_list for pos in sec.hex.neighbor_positions]
-        )
-        while len(list(potential_positions)) > 0:
-            pos = random.choice(list(potential_positions))
-            if pos not in [sec.hex.center for sec in self.galaxy.sector_list]:
-                # breakpoint()
-                return pos
-            potential_positions.remove(pos)
-
-        raise SectorGenerationException("No valid hex found for sector")
+            self._generate_sector_highways_for_cluster(cluster)
 
     def _generate_clusters_and_sectors(self) -> None:
+        for cluster in self.galaxy.cluster_list:
+            self.scorer.on_cluster(cluster)
+        self.scorer.check(self._get_progress())
+
         while self.galaxy.sector_count < self.config.sector_count:
-            cluster_id = self.galaxy.cluster_count
+            # imported clusters keep their vanilla ids, which aren't contiguous
+            cluster_id = max(self.galaxy.clusters.keys(), default=-1) + 1
             cluster = Cluster(
                 id=cluster_id,
             )
             self.galaxy.clusters[cluster_id] = cluster
 
             max_sectors = random.randint(1, 3)
-            for i in range(0, max_sectors):
+            positions = self.placement.place_cluster(max_sectors)
+            if len(positions) == 0:
+                raise SectorGenerationException("No free hexes left for sector")
+            for i, position in enumerate(positions):
                 sector = Sector(
                     id=i,
-                    position=self._get_position_for_sector(cluster),
+                    position=position,
                     cluster_id=cluster_id,
                 )
                 cluster.sectors[i] = sector
+
+            self.scorer.on_cluster(cluster)
+            self.scorer.check(self._get_progress())
+
+    def regenerate_cluster(
+        self,
+        cluster_id: int,
+        *,
+        sector_count: int | None = None,
+        position: Position | None = None,
+    ) -> ChangeSet:
+        """Re-roll the sectors of a single cluster, optionally moving its first
+        sector to `position`. Only the cluster's own highways and the gates that
+        touch it are rebuilt; gates keep their partners and direction so they keep
+        their labels. Everything else in the galaxy is left alone."""
+        if cluster_id not in self.galaxy.clusters:
+            raise SectorGenerationException(f"No cluster with id {cluster_id}")
+        if len(self.hex_grid) == 0:
+            self._generate_hex_grid()
+
+        cluster = self.galaxy.clusters[cluster_id]
+        old_sector_labels = {sec.label for sec in cluster.sector_list}
+        old_gates: list[InterClusterConnector] = []
+        kept_gates: list[InterClusterConnector] = []
+        for hw in self.galaxy.highways:
+            if cluster_id in (hw.entry_cluster.id, hw.exit_cluster.id):
+                old_gates.append(hw)
+            else:
+                kept_gates.append(hw)
+
+        # imported sectors sit wherever vanilla put them, so go by their cells
+        old_positions = {
+            self.placement.cell(sec.position) for sec in cluster.sector_list
+        }
+        if (
+            position is not None
+            and self.placement.cell(position) not in old_positions
+            and not self.placement.is_free(position)
+        ):
+            raise SectorGenerationException(f"Position {position} is already taken")
+
+        for pos in old_positions:
+            self.placement.release(pos)
+        positions = self.placement.place_cluster(
+            sector_count or random.randint(1, 3), seed=position
+        )
+        if len(positions) == 0:
+            raise SectorGenerationException("No free hexes left for sector")
+        cluster.sectors = {
+            i: Sector(id=i, position=pos, cluster_id=cluster_id)
+            for i, pos in enumerate(positions)
+        }
+        cluster.imported = False
+        cluster.inter_sector_highways = []
+        self._generate_sector_highways_for_cluster(cluster)
+        if self.region_seed is not None:
+            assign_regions([cluster], self.config.regions, self.region_seed)
+
+        new_gates = [
+            self._connect_clusters(hw.entry_cluster, hw.exit_cluster)
+            for hw in old_gates
+        ]
+        if len(new_gates) == 0 and self.galaxy.cluster_count > 1:
+            # it was never connected, so at least join it to its nearest neighbour
+            nearest = min(
+                self.galaxy.get_cluster_siblings(cluster),
+                key=lambda x: distance_between_points(x.position, cluster.position),
+            )
+            new_gates.append(self._connect_clusters(cluster, nearest))
+        self.galaxy.highways = kept_gates + new_gates
+        # sectors and gates changed, so every territory might have
+        self._generate_territories()
+
+        return ChangeSet(
+            clusters=[cluster],
+            sectors=cluster.sector_list,
+            removed_sectors=sorted(
+                old_sector_labels - {sec.label for sec in cluster.sector_list}
+            ),
+            highways=new_gates,
+            removed_highways=[],
+        )
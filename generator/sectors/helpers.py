@@ -1,7 +1,14 @@
 import math
 import random
 
-from generator.sectors.models import Cluster, LocationInSector, Position, Sector
+from generator.sectors.models import (
+    Cluster,
+    LocationInSector,
+    Position,
+    Sector,
+    a,
+    b,
+)
 
 
 def get_default_position() -> Position:
@@ -123,3 +130,22 @@ def convert_km_to_m_galaxy_scale(distance_km: int) -> int:
     # this is here because things on the galactic/cluster scale are very large
     # and need an extra level of multiplier to work. i think? maybe? we'll see
     return distance_km * 100 * 1_000
+
+
+def snap_to_hex_lattice(pos: Position, radius: float) -> Position:
+    """Snap an arbitrary position onto the centre of the nearest hex of the grid
+    built by `SectorGenerator._generate_hex_grid`."""
+    # the grid is spanned by a(radius) and b(radius), so solve for those
+    # coefficients and round them the same way you'd round cube coordinates
+    total = 2 * pos.x / (math.sqrt(3) * radius)
+    diff = 2 * pos.z / radius
+    q = (total + diff) / 2
+    r = (total - diff) / 2
+    s = -q - r
+    rq, rr, rs = round(q), round(r), round(s)
+    dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+    return a(radius) * rq + b(radius) * rr
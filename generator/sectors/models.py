@@ -3,6 +3,7 @@ from statistics import mean
 from typing import NamedTuple, cast
 
 
+import numpy as np
 from pydantic import BaseModel, ConfigDict
 
 
@@ -81,6 +82,8 @@ class InterClusterConnector(Connector):
     one_way: bool = False
     entry_cluster: "Cluster"
     exit_cluster: "Cluster"
+    # read from the base game's maps, and left as it was there
+    imported: bool = False
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -175,13 +178,44 @@ class Sector:
         return f"Cluster_{self.cluster_id:02}_Sector{self.id:03}"
 
 
+class Region:
+    """Asteroid fields and nebulas. Both are regions in X4, the difference is in
+    what they're made of."""
+
+    def __init__(
+        self,
+        id: int,
+        *,
+        cluster_id: int,
+        position: Position,
+        resources: list[str],
+        # one of lowest/low/medium/high/veryhigh, like X4's resource yields
+        resource_yield: str = "medium",
+        nebula: bool = False,
+        radius: float = 40_000,
+    ) -> None:
+        self.id = id
+        self.cluster_id = cluster_id
+        self.position = position
+        self.resources = resources
+        self.resource_yield = resource_yield
+        self.nebula = nebula
+        self.radius = radius
+
+    @property
+    def label(self) -> str:
+        return f"Cluster_{self.cluster_id:02}_Region{self.id:03}"
+
+    @property
+    def definition(self) -> str:
+        return f"xu_rand_{self.label.lower()}"
+
+
 class Cluster:
     # areas: ... not required
-    # regions: ... not required
     # content: ...
     # planets: ... not required
     # suns: ... not required
-    # nebulas: ... not required
     # rendereffects: ...
     # lensflares: ...
 
@@ -192,14 +226,22 @@ class Cluster:
         name: str | None = None,
         sectors: dict[int, Sector] | None = None,
         inter_sector_highways: list[InterSectorConnector] | None = None,
+        regions: list[Region] | None = None,
+        imported: bool = False,
         # position: Position,
         # radius: float = 250_000,
     ) -> None:
         self.id = id
         self.name = name
+        # read from the base game's maps, and its sectors with it. the base game
+        # has more in these than we read, so they're only written out again if
+        # the generator changes them
+        self.imported = imported
 
         self.sectors = sectors or {}
         self.inter_sector_highways = inter_sector_highways or []
+        # includes nebulas
+        self.regions = regions or []
 
     @property
     def position_unsafe(self) -> Position | None:
@@ -232,6 +274,30 @@ class Cluster:
         return list(sectors_copy.values())
 
 
+UNCLAIMED = -1
+
+
+class Territory(NamedTuple):
+    factions: list[str]
+    # in `Galaxy.sector_list` order, which the arrays below line up with
+    sectors: list[Sector]
+    # faction index owning each sector, or UNCLAIMED if no faction could reach it
+    # or it was imported and keeps its vanilla owner
+    owners: np.ndarray
+    # sector row of each faction's home
+    homes: np.ndarray
+    # jumps from each sector to its owner's home
+    distances: np.ndarray
+
+    @property
+    def sector_owners(self) -> dict[str, str | None]:
+        """Owning faction by sector compound id."""
+        return {
+            sec.compound_id: (self.factions[owner] if owner != UNCLAIMED else None)
+            for sec, owner in zip(self.sectors, self.owners.tolist())
+        }
+
+
 class Galaxy:
     clusters: dict[int, Cluster] = {}
     highways: list[InterClusterConnector] = []
@@ -244,6 +310,7 @@ class Galaxy:
     ) -> None:
         self.clusters = clusters
         self.highways = highways
+        self.territory: Territory | None = None
 
     @property
     def cluster_count(self) -> int:
@@ -271,3 +338,19 @@ class Galaxy:
 
     def get_sector_siblings(self, target: Sector) -> list[Sector]:
         return [sec for sec in self.sector_list if sec.id != target.id]
+
+
+class ChangeSet(NamedTuple):
+    """What a localized edit to the galaxy touched, so it can be exported
+    without rewriting everything else."""
+
+    # clusters whose sectors or position changed
+    clusters: list[Cluster]
+    # sectors that were added or moved
+    sectors: list[Sector]
+    # labels of sectors that no longer exist
+    removed_sectors: list[str]
+    # gates that were added or rebuilt
+    highways: list[InterClusterConnector]
+    # labels of gates that no longer exist
+    removed_highways: list[str]
@@ -0,0 +1,42 @@
+import numpy as np
+
+# lattice size of the noise; it repeats after this many units
+PERIOD = 256
+
+
+def _fade(t: np.ndarray) -> np.ndarray:
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+def value_noise(x: np.ndarray, z: np.ndarray, seed: int) -> np.ndarray:
+    """Smooth 2D value noise in [0, 1] at every (x, z) at once. Lattice points are
+    one unit apart, so scale coordinates down to get larger features."""
+    rng = np.random.default_rng(seed)
+    perm = rng.permutation(PERIOD)
+    values = rng.random(PERIOD)
+
+    x0 = np.floor(x).astype(np.int64)
+    z0 = np.floor(z).astype(np.int64)
+    u = _fade(x - x0)
+    v = _fade(z - z0)
+
+    def lattice(ix: np.ndarray, iz: np.ndarray) -> np.ndarray:
+        return values[perm[(perm[ix % PERIOD] + iz) % PERIOD]]
+
+    top = lattice(x0, z0) * (1 - u) + lattice(x0 + 1, z0) * u
+    bottom = lattice(x0, z0 + 1) * (1 - u) + lattice(x0 + 1, z0 + 1) * u
+    return top * (1 - v) + bottom * v
+
+
+def fractal_noise(
+    x: np.ndarray, z: np.ndarray, seed: int, octaves: int = 3
+) -> np.ndarray:
+    """Layers of `value_noise`, each twice as fine and half as strong as the last,
+    scaled back into [0, 1]."""
+    total = np.zeros(np.shape(x))
+    amplitude = 1.0
+    for octave in range(octaves):
+        scale = 2**octave
+        total += amplitude * value_noise(x * scale, z * scale, seed + octave)
+        amplitude /= 2
+    return total / (2 - 2 ** (1 - octaves))
@@ -0,0 +1,145 @@
+import random
+
+import numpy as np
+
+from config.models import GalaxyShape
+from generator.sectors.helpers import snap_to_hex_lattice
+from generator.sectors.models import Hex, Position
+from generator.sectors.shapes import AliasTable, shape_weights
+
+# random draws to try before falling back to scanning every free hex for a seed
+MAX_RANDOM_SEED_ATTEMPTS = 20
+
+
+class PlacementEngine:
+    """Keeps track of which hexes of the grid are free, and hands out contiguous
+    groups of them for clusters.
+
+    Positions are kept as `cell`s, since walking to the same hex along different
+    paths doesn't always land on exactly the same float. With a `shape`, hexes
+    it leaves out aren't part of the grid at all, and seeds are drawn by its
+    weights."""
+
+    def __init__(
+        self,
+        grid: set[Hex],
+        taken: set[Position],
+        radius: float = 250_000,
+        shape: GalaxyShape | None = None,
+    ) -> None:
+        self.radius = radius
+        cells = sorted({self.cell(hex.center) for hex in grid})
+        self._seed_table: AliasTable | None = None
+        self._cells: list[Position] = cells
+        if shape is not None and shape.kind != "round":
+            weights = shape_weights(
+                shape,
+                np.array([pos.x for pos in cells], dtype=float),
+                np.array([pos.z for pos in cells], dtype=float),
+            )
+            kept = np.flatnonzero(weights > 0)
+            self._cells = [cells[i] for i in kept]
+            if len(kept) > 0:
+                self._seed_table = AliasTable(weights[kept])
+        self.grid: set[Position] = set(self._cells)
+        # list + index so picking a random free hex and removing it are both O(1)
+        self._free: list[Position] = []
+        self._index: dict[Position, int] = {}
+        taken = {self.cell(pos) for pos in taken}
+        for pos in self.grid - taken:
+            self.release(pos)
+
+    def cell(self, pos: Position) -> Position:
+        """The hex `pos` is in, as the rounded centre worked out straight from the
+        lattice. Anything inside the same hex, imported sectors included, gets
+        the same cell."""
+        return Position.round(snap_to_hex_lattice(pos, self.radius))
+
+    @property
+    def free_count(self) -> int:
+        return len(self._free)
+
+    def is_free(self, pos: Position) -> bool:
+        return self.cell(pos) in self._index
+
+    def take(self, pos: Position) -> None:
+        pos = self.cell(pos)
+        index = self._index.pop(pos)
+        last = self._free.pop()
+        if last != pos:
+            self._free[index] = last
+            self._index[last] = index
+
+    def release(self, pos: Position) -> None:
+        pos = self.cell(pos)
+        if pos in self.grid and pos not in self._index:
+            self._index[pos] = len(self._free)
+            self._free.append(pos)
+
+    def _free_neighbors(self, pos: Position) -> list[Position]:
+        return [
+            self.cell(x)
+            for x in Hex(center=pos, radius=self.radius).neighbor_positions
+            if self.is_free(x)
+        ]
+
+    def _has_room(self, seed: Position, size: int) -> bool:
+        """Is there a connected patch of at least `size` free hexes around `seed`?"""
+        seen = {seed}
+        queue = [seed]
+        while len(queue) > 0 and len(seen) < size:
+            for pos in self._free_neighbors(queue.pop()):
+                if pos not in seen:
+                    seen.add(pos)
+                    queue.append(pos)
+        return len(seen) >= size
+
+    def _draw_seed(self) -> Position:
+        if self._seed_table is None:
+            return random.choice(self._free)
+        # taken hexes are still in the table, and just count as a failed attempt
+        return self._cells[self._seed_table.draw()]
+
+    def _find_seed(self, size: int) -> Position | None:
+        for _ in range(min(MAX_RANDOM_SEED_ATTEMPTS, len(self._free))):
+            seed = self._draw_seed()
+            if self.is_free(seed) and self._has_room(seed, size):
+                return seed
+        # the grid is crowded, so look through everything that's left
+        for seed in random.sample(self._free, len(self._free)):
+            if self._has_room(seed, size):
+                return seed
+        return None
+
+    def _grow(self, seed: Position, size: int) -> list[Position]:
+        placed = [seed]
+        self.take(seed)
+        frontier = set(self._free_neighbors(seed))
+        while len(placed) < size:
+            pos = random.choice(list(frontier))
+            placed.append(pos)
+            self.take(pos)
+            frontier.discard(pos)
+            frontier.update(self._free_neighbors(pos))
+        return placed
+
+    def place_cluster(self, size: int, seed: Position | None = None) -> list[Position]:
+        """Take up to `size` contiguous free hexes, starting from `seed` if given.
+
+        Rather than failing when a cluster doesn't fit, this tries other seeds and
+        then smaller sizes, so it only comes back empty once the grid is full."""
+        if seed is not None:
+            seed = self.cell(seed)
+            if not self.is_free(seed):
+                return []
+        for attempt_size in range(size, 0, -1):
+            if seed is None:
+                attempt_seed = self._find_seed(attempt_size)
+            elif self._has_room(seed, attempt_size):
+                attempt_seed = seed
+            else:
+                attempt_seed = None
+            if attempt_seed is not None:
+                # any free patch that's big enough can't run out while growing
+                return self._grow(attempt_seed, attempt_size)
+        return []
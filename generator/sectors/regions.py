@@ -0,0 +1,86 @@
+import numpy as np
+
+from config.models import RegionSettings
+from generator.sectors.models import Cluster, Region
+from generator.sectors.noise import fractal_noise
+
+# picked from the composition field, lowest values first. nividium only shows up
+# at the very top, so it stays rare
+MINERALS = ["ore", "silicon", "ice", "nividium"]
+MINERAL_BINS = [0.45, 0.65, 0.85]
+GASES = ["hydrogen", "helium", "methane"]
+GAS_BINS = [0.45, 0.65]
+YIELDS = ["lowest", "low", "medium", "high", "veryhigh"]
+
+FIELD_RADIUS = 40_000
+NEBULA_RADIUS = 80_000
+
+
+def assign_regions(
+    clusters: list[Cluster], settings: RegionSettings, seed: int
+) -> None:
+    """Fill in the asteroid fields and nebulas of the given clusters. Imported
+    clusters keep the regions the base game gives them.
+
+    Every noise field is evaluated over all cluster and sector centroids in one
+    go; the same seed always gives a cluster the same regions, so clusters can be
+    redone on their own later."""
+    clusters = [
+        cluster
+        for cluster in clusters
+        if cluster.sector_count > 0 and not cluster.imported
+    ]
+    sectors = [sec for cluster in clusters for sec in cluster.sector_list]
+    if len(sectors) == 0:
+        return
+
+    points = np.array(
+        [(c.position.x, c.position.z) for c in clusters]
+        + [(sec.position.x, sec.position.z) for sec in sectors],
+        dtype=float,
+    )
+    x = points[:, 0] / settings.noise_scale
+    z = points[:, 1] / settings.noise_scale
+    richness, fields, composition, nebulas = (
+        fractal_noise(x, z, seed + i * settings.octaves, settings.octaves)
+        for i in range(4)
+    )
+
+    # clusters come first in every field, then sectors
+    cluster_rows = {cluster.id: i for i, cluster in enumerate(clusters)}
+    clusters_by_id = {cluster.id: cluster for cluster in clusters}
+    sector_slice = slice(len(clusters), None)
+    yields = np.clip((richness * len(YIELDS)).astype(int), 0, len(YIELDS) - 1)
+    has_field = fields[sector_slice] > settings.asteroid_threshold
+    has_nebula = nebulas[sector_slice] > settings.nebula_threshold
+    minerals = np.digitize(composition[sector_slice], MINERAL_BINS)
+    gases = np.digitize(composition[sector_slice], GAS_BINS)
+
+    for cluster in clusters:
+        cluster.regions = []
+    for i, sector in enumerate(sectors):
+        cluster = clusters_by_id[sector.cluster_id]
+        resource_yield = YIELDS[yields[cluster_rows[cluster.id]]]
+        if has_field[i]:
+            cluster.regions.append(
+                Region(
+                    len(cluster.regions) + 1,
+                    cluster_id=cluster.id,
+                    position=sector.position,
+                    resources=[MINERALS[minerals[i]]],
+                    resource_yield=resource_yield,
+                    radius=FIELD_RADIUS,
+                )
+            )
+        if has_nebula[i]:
+            cluster.regions.append(
+                Region(
+                    len(cluster.regions) + 1,
+                    cluster_id=cluster.id,
+                    position=sector.position,
+                    resources=[GASES[gases[i]]],
+                    resource_yield=resource_yield,
+                    nebula=True,
+                    radius=NEBULA_RADIUS,
+                )
+            )
@@ -0,0 +1,194 @@
+import math
+from typing import NamedTuple
+
+from config.models import Config
+from generator.sectors.helpers import break_compound_id
+from generator.sectors.models import Cluster, InterClusterConnector
+
+
+class SeedRejectedException(Exception):
+    """Raised mid-generation once a seed can no longer meet the quality thresholds."""
+
+    def __init__(self, metric: str, value: float, *args: object) -> None:
+        # args have to match the constructor, or the exception can't be pickled
+        # back out of a worker process
+        super().__init__(metric, value, *args)
+        self.metric = metric
+        self.value = value
+
+    def __str__(self) -> str:
+        return f"{self.metric} can no longer pass (at {self.value:.3f})"
+
+
+class GenerationProgress(NamedTuple):
+    # sectors still to be placed before we hit the configured count
+    remaining_sectors: int
+    # distance from the origin to the furthest hex of the grid
+    grid_radius: float
+    highways_done: bool = False
+
+
+class Metric:
+    """A quality measure that's built up as the generator goes.
+
+    `can_still_pass` has to be optimistic: it may only return False once no
+    possible outcome of the remaining generation could meet the threshold."""
+
+    name = "metric"
+
+    def on_cluster(self, cluster: Cluster) -> None:
+        pass
+
+    def on_highway(self, highway: InterClusterConnector) -> None:
+        pass
+
+    @property
+    def value(self) -> float:
+        return 0.0
+
+    def can_still_pass(self, progress: GenerationProgress) -> bool:
+        return True
+
+
+class SingleSectorClusterMetric(Metric):
+    """Fraction of clusters that only have one sector."""
+
+    name = "single_sector_cluster_ratio"
+
+    def __init__(self, max_ratio: float) -> None:
+        self.max_ratio = max_ratio
+        self.clusters = 0
+        self.single_sector_clusters = 0
+
+    def on_cluster(self, cluster: Cluster) -> None:
+        self.clusters += 1
+        if cluster.sector_count == 1:
+            self.single_sector_clusters += 1
+
+    @property
+    def value(self) -> float:
+        if self.clusters == 0:
+            return 0.0
+        return self.single_sector_clusters / self.clusters
+
+    def can_still_pass(self, progress: GenerationProgress) -> bool:
+        # best case, every remaining sector goes into a two-sector cluster. the
+        # last cluster can go over the sector count, so an odd one out still
+        # gets a cluster of its own
+        best_clusters = self.clusters + (progress.remaining_sectors + 1) // 2
+        if best_clusters == 0:
+            return True
+        return self.single_sector_clusters / best_clusters <= self.max_ratio
+
+
+class LayoutBalanceMetric(Metric):
+    """How far the centre of mass of the sectors is from the middle of the grid,
+    as a fraction of the grid's radius."""
+
+    name = "layout_offset"
+
+    def __init__(self, max_offset: float) -> None:
+        self.max_offset = max_offset
+        self.sectors = 0
+        self.sum_x = 0.0
+        self.sum_z = 0.0
+        self.grid_radius = 0.0
+
+    def on_cluster(self, cluster: Cluster) -> None:
+        for sector in cluster.sector_list:
+            self.sectors += 1
+            self.sum_x += sector.position.x
+            self.sum_z += sector.position.z
+
+    @property
+    def value(self) -> float:
+        if self.sectors == 0 or self.grid_radius == 0:
+            return 0.0
+        return math.hypot(self.sum_x, self.sum_z) / self.sectors / self.grid_radius
+
+    def can_still_pass(self, progress: GenerationProgress) -> bool:
+        self.grid_radius = progress.grid_radius
+        if self.sectors == 0 or self.grid_radius == 0:
+            return True
+        # best case, every remaining sector lands on the far rim, pulling the
+        # centre of mass straight back towards the middle
+        pull_back = progress.remaining_sectors * self.grid_radius
+        best_offset = max(0.0, math.hypot(self.sum_x, self.sum_z) - pull_back)
+        sectors = self.sectors + progress.remaining_sectors
+        return best_offset / sectors / self.grid_radius <= self.max_offset
+
+
+class ConnectivityMetric(Metric):
+    """Number of separate groups of clusters that can't reach each other by gate."""
+
+    name = "disconnected_groups"
+
+    def __init__(self, max_groups: int) -> None:
+        self.max_groups = max_groups
+        self.parents: dict[int, int] = {}
+        self.groups = 0
+
+    def _find(self, cluster_id: int) -> int:
+        if cluster_id not in self.parents:
+            self.parents[cluster_id] = cluster_id
+            self.groups += 1
+        root = cluster_id
+        while self.parents[root] != root:
+            root = self.parents[root]
+        while self.parents[cluster_id] != root:
+            self.parents[cluster_id], cluster_id = root, self.parents[cluster_id]
+        return root
+
+    def on_cluster(self, cluster: Cluster) -> None:
+        self._find(cluster.id)
+
+    def on_highway(self, highway: InterClusterConnector) -> None:
+        a, b = (self._find(x) for x in break_compound_id(highway.id))
+        if a != b:
+            self.parents[a] = b
+            self.groups -= 1
+
+    @property
+    def value(self) -> float:
+        return self.groups
+
+    def can_still_pass(self, progress: GenerationProgress) -> bool:
+        # any cluster still to be looked at could join everything up, so this
+        # can only be called once the gates are all in
+        return not progress.highways_done or self.groups <= self.max_groups
+
+
+class SeedScorer:
+    def __init__(self, metrics: list[Metric] | None = None) -> None:
+        self.metrics = metrics or []
+
+    @classmethod
+    def from_config(cls, config: Config) -> "SeedScorer":
+        thresholds = config.quality
+        metrics: list[Metric] = []
+        if thresholds.max_single_sector_cluster_ratio is not None:
+            metrics.append(
+                SingleSectorClusterMetric(thresholds.max_single_sector_cluster_ratio)
+            )
+        if thresholds.max_layout_offset is not None:
+            metrics.append(LayoutBalanceMetric(thresholds.max_layout_offset))
+        if thresholds.max_disconnected_groups is not None:
+            metrics.append(ConnectivityMetric(thresholds.max_disconnected_groups))
+        return cls(metrics)
+
+    def on_cluster(self, cluster: Cluster) -> None:
+        for metric in self.metrics:
+            metric.on_cluster(cluster)
+
+    def on_highway(self, highway: InterClusterConnector) -> None:
+        for metric in self.metrics:
+            metric.on_highway(highway)
+
+    def check(self, progress: GenerationProgress) -> None:
+        for metric in self.metrics:
+            if not metric.can_still_pass(progress):
+                raise SeedRejectedException(metric.name, metric.value)
+
+    @property
+    def scores(self) -> dict[str, float]:
+        return {metric.name: metric.value for metric in self.metrics}
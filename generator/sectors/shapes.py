@@ -0,0 +1,78 @@
+import math
+import random
+
+import numpy as np
+
+from config.models import GalaxyShape
+
+
+def _spiral(shape: GalaxyShape, r: np.ndarray, theta: np.ndarray) -> np.ndarray:
+    # how far round we are from the nearest arm, once the arms are wound up
+    phase = np.mod((theta - shape.twist * r) * shape.arms, 2 * math.pi)
+    arm_angle = np.minimum(phase, 2 * math.pi - phase) / shape.arms
+    arms = np.exp(-((arm_angle * r) ** 2) / (2 * shape.width**2))
+    core = np.exp(-(r**2) / (2 * shape.width**2))
+    return np.maximum(arms, core)
+
+
+def _ring(shape: GalaxyShape, r: np.ndarray, theta: np.ndarray) -> np.ndarray:
+    return np.exp(-((r - shape.ring_radius) ** 2) / (2 * shape.width**2))
+
+
+def _cores(shape: GalaxyShape, r: np.ndarray, theta: np.ndarray) -> np.ndarray:
+    angles = np.arange(shape.cores) * 2 * math.pi / shape.cores
+    core_x = shape.ring_radius * np.cos(angles)
+    core_z = shape.ring_radius * np.sin(angles)
+    x, z = r * np.cos(theta), r * np.sin(theta)
+    # (hexes, cores) distances, then keep the closest core for each hex
+    distances = np.hypot(x[:, None] - core_x[None, :], z[:, None] - core_z[None, :])
+    return np.exp(-(distances.min(axis=1) ** 2) / (2 * shape.width**2))
+
+
+SHAPES = {
+    "spiral": _spiral,
+    "ring": _ring,
+    "cores": _cores,
+}
+
+
+def shape_weights(shape: GalaxyShape, x: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """How likely each hex is to be picked as a cluster seed, for the whole grid in
+    one go. Hexes below the shape's cutoff get 0 and are left out entirely."""
+    if shape.kind == "round" or len(x) == 0:
+        return np.ones(len(x))
+    r = np.hypot(x, z)
+    # scale to the grid, so shapes fit whatever size it ends up being
+    r = r / max(r.max(), 1)
+    theta = np.arctan2(z, x) - shape.rotation
+    weights = SHAPES[shape.kind](shape, r, theta)
+    return np.where(weights >= shape.cutoff, weights, 0.0)
+
+
+class AliasTable:
+    """Walker's alias method: O(n) to build, then every weighted draw is O(1)."""
+
+    def __init__(self, weights: np.ndarray) -> None:
+        count = len(weights)
+        scaled = weights * count / weights.sum()
+        self.probabilities = np.ones(count)
+        self.aliases = np.arange(count)
+
+        small = list(np.flatnonzero(scaled < 1))
+        large = list(np.flatnonzero(scaled >= 1))
+        while len(small) > 0 and len(large) > 0:
+            less, more = small.pop(), large.pop()
+            self.probabilities[less] = scaled[less]
+            self.aliases[less] = more
+            scaled[more] -= 1 - scaled[less]
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        # whatever's left is 1 give or take float error
+
+    def draw(self) -> int:
+        index = int(random.random() * len(self.probabilities))
+        if random.random() < self.probabilities[index]:
+            return index
+        return int(self.aliases[index])
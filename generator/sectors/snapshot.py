@@ -0,0 +1,211 @@
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+from generator.sectors.models import Galaxy, Position
+
+# every column starts on an 8 byte boundary so the views stay aligned
+ALIGNMENT = 8
+
+
+class Column(NamedTuple):
+    dtype: str
+    shape: tuple[int, ...]
+    offset: int
+
+
+class SnapshotHandle(NamedTuple):
+    """Everything a worker needs to attach to a snapshot. Small and cheap to pickle,
+    no matter how big the galaxy is."""
+
+    columns: dict[str, Column]
+    size: int
+    # name of the shared memory block, or path of the memory-mapped file
+    shm_name: str | None = None
+    path: str | None = None
+
+
+def _galaxy_columns(galaxy: Galaxy) -> dict[str, np.ndarray]:
+    sectors = galaxy.sector_list
+    rows = {sec.compound_id: i for i, sec in enumerate(sectors)}
+    sector_highways = [
+        hw for cluster in galaxy.cluster_list for hw in cluster.inter_sector_highways
+    ]
+
+    def sector_rows(points: list) -> np.ndarray:
+        return np.array([rows[x.sector.compound_id] for x in points], dtype=np.int64)
+
+    def positions(points: list) -> np.ndarray:
+        return np.array([tuple(x.position) for x in points], dtype=np.float64).reshape(
+            -1, 3
+        )
+
+    return {
+        "sector_positions": np.array(
+            [tuple(sec.position) for sec in sectors], dtype=np.float64
+        ).reshape(-1, 3),
+        "sector_radii": np.array([sec.hex.radius for sec in sectors], dtype=np.float64),
+        "sector_ids": np.array([sec.id for sec in sectors], dtype=np.int64),
+        "sector_cluster_ids": np.array(
+            [sec.cluster_id for sec in sectors], dtype=np.int64
+        ),
+        "highway_entry_sectors": sector_rows(
+            [hw.entry_point for hw in galaxy.highways]
+        ),
+        "highway_exit_sectors": sector_rows([hw.exit_point for hw in galaxy.highways]),
+        "highway_entry_positions": positions(
+            [hw.entry_point for hw in galaxy.highways]
+        ),
+        "highway_exit_positions": positions([hw.exit_point for hw in galaxy.highways]),
+        "sector_highway_entry_sectors": sector_rows(
+            [hw.entry_point for hw in sector_highways]
+        ),
+        "sector_highway_exit_sectors": sector_rows(
+            [hw.exit_point for hw in sector_highways]
+        ),
+    }
+
+
+def _layout(arrays: dict[str, np.ndarray]) -> tuple[dict[str, Column], int]:
+    columns: dict[str, Column] = {}
+    offset = 0
+    for name, array in arrays.items():
+        columns[name] = Column(array.dtype.str, array.shape, offset)
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    # shared memory can't be empty
+    return columns, max(offset, ALIGNMENT)
+
+
+class GalaxyView:
+    """Read-only, zero-copy view of a galaxy snapshot. Rows line up across the
+    sector columns, and the highway columns point at sector rows."""
+
+    def __init__(self, handle: SnapshotHandle, buffer: memoryview | np.ndarray) -> None:
+        self.handle = handle
+        self._buffer = buffer
+        self.columns: dict[str, np.ndarray] = {}
+        for name, column in handle.columns.items():
+            array = np.ndarray(
+                column.shape,
+                dtype=np.dtype(column.dtype),
+                buffer=buffer,
+                offset=column.offset,
+            )
+            array.flags.writeable = False
+            self.columns[name] = array
+
+    @property
+    def sector_count(self) -> int:
+        return len(self.columns["sector_ids"])
+
+    @property
+    def cluster_ids(self) -> np.ndarray:
+        return np.unique(self.columns["sector_cluster_ids"])
+
+    @property
+    def cluster_count(self) -> int:
+        return len(self.cluster_ids)
+
+    def sector_position(self, row: int) -> Position:
+        return Position(*self.columns["sector_positions"][row].tolist())
+
+    def sectors_in_cluster(self, cluster_id: int) -> np.ndarray:
+        return np.flatnonzero(self.columns["sector_cluster_ids"] == cluster_id)
+
+    def cluster_positions(self) -> np.ndarray:
+        """Mean sector position of every cluster, ordered like `cluster_ids`."""
+        ids, inverse, counts = np.unique(
+            self.columns["sector_cluster_ids"], return_inverse=True, return_counts=True
+        )
+        sums = np.zeros((len(ids), 3))
+        np.add.at(sums, inverse, self.columns["sector_positions"])
+        return sums / counts[:, None]
+
+    def highway_cluster_pairs(self) -> np.ndarray:
+        """(entry cluster id, exit cluster id) of every gate."""
+        cluster_ids = self.columns["sector_cluster_ids"]
+        return np.stack(
+            [
+                cluster_ids[self.columns["highway_entry_sectors"]],
+                cluster_ids[self.columns["highway_exit_sectors"]],
+            ],
+            axis=-1,
+        )
+
+
+class SharedGalaxy:
+    """Owns a snapshot of a galaxy in shared memory (or a memory-mapped file when
+    `path` is given). Hand `handle` to workers and have them `attach` to it,
+    instead of pickling the galaxy for every one of them."""
+
+    def __init__(self, galaxy: Galaxy, *, path: str | None = None) -> None:
+        arrays = _galaxy_columns(galaxy)
+        columns, size = _layout(arrays)
+
+        self._shm: shared_memory.SharedMemory | None = None
+        buffer: memoryview | np.ndarray
+        if path is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            buffer = self._shm.buf
+            self.handle = SnapshotHandle(columns, size, shm_name=self._shm.name)
+        else:
+            buffer = np.memmap(path, dtype=np.uint8, mode="w+", shape=(size,))
+            self.handle = SnapshotHandle(columns, size, path=path)
+
+        for name, array in arrays.items():
+            column = columns[name]
+            np.ndarray(
+                column.shape, dtype=array.dtype, buffer=buffer, offset=column.offset
+            )[...] = array
+        if isinstance(buffer, np.memmap):
+            buffer.flush()
+        del buffer
+
+    def close(self) -> None:
+        """Release the snapshot. Workers should be done with it by now."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "SharedGalaxy":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+class AttachedGalaxy:
+    """A worker's connection to a snapshot. Use as a context manager, and don't
+    keep the view or any of its arrays around after it exits."""
+
+    def __init__(self, handle: SnapshotHandle) -> None:
+        self._shm: shared_memory.SharedMemory | None = None
+        buffer: memoryview | np.ndarray
+        if handle.shm_name is not None:
+            self._shm = shared_memory.SharedMemory(name=handle.shm_name)
+            buffer = self._shm.buf
+        else:
+            buffer = np.memmap(
+                handle.path, dtype=np.uint8, mode="r", shape=(handle.size,)
+            )
+        self.view = GalaxyView(handle, buffer)
+
+    def close(self) -> None:
+        # the views have to go before the shared memory can be closed
+        self.view.columns.clear()
+        self.view._buffer = None  # type: ignore
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self) -> GalaxyView:
+        return self.view
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def attach(handle: SnapshotHandle) -> AttachedGalaxy:
+    return AttachedGalaxy(handle)
@@ -0,0 +1,135 @@
+import random
+from typing import NamedTuple
+
+import numpy as np
+
+from generator.sectors.models import UNCLAIMED, Galaxy, Sector, Territory
+
+
+class SectorGraph(NamedTuple):
+    """Sectors joined by gates and highways, in compressed sparse row form: the
+    neighbours of row `i` are `indices[indptr[i]:indptr[i + 1]]`."""
+
+    sectors: list[Sector]
+    indptr: np.ndarray
+    indices: np.ndarray
+
+
+def build_sector_graph(galaxy: Galaxy) -> SectorGraph:
+    sectors = galaxy.sector_list
+    rows = {sec.compound_id: i for i, sec in enumerate(sectors)}
+    connectors = [*galaxy.highways] + [
+        hw for cluster in galaxy.cluster_list for hw in cluster.inter_sector_highways
+    ]
+    edges = np.array(
+        [
+            (
+                rows[hw.entry_point.sector.compound_id],
+                rows[hw.exit_point.sector.compound_id],
+            )
+            for hw in connectors
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    # every connection can be travelled both ways
+    sources = np.concatenate([edges[:, 0], edges[:, 1]])
+    targets = np.concatenate([edges[:, 1], edges[:, 0]])
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(len(sectors) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(sources, minlength=len(sectors)))
+    return SectorGraph(sectors, indptr, targets[order])
+
+
+def _bfs(graph: SectorGraph, sources: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    """Multi-source breadth-first search. Returns, for every sector, the index of
+    the source that reached it first and how many jumps away it is."""
+    # plain lists, since indexing numpy arrays one element at a time is slow
+    owners = [UNCLAIMED] * len(graph.sectors)
+    distances = [-1] * len(graph.sectors)
+    indptr, indices = graph.indptr.tolist(), graph.indices.tolist()
+    queue: list[int] = []
+    for owner, row in enumerate(sources):
+        if owners[row] == UNCLAIMED:
+            owners[row] = owner
+            distances[row] = 0
+            queue.append(row)
+    # a plain list works as the queue since nothing is ever removed from it
+    head = 0
+    while head < len(queue):
+        row = queue[head]
+        head += 1
+        for neighbor in indices[indptr[row] : indptr[row + 1]]:
+            if owners[neighbor] == UNCLAIMED:
+                owners[neighbor] = owners[row]
+                distances[neighbor] = distances[row] + 1
+                queue.append(neighbor)
+    return np.array(owners, dtype=np.int64), np.array(distances, dtype=np.int64)
+
+
+def _walk_closer(
+    indptr: list[int], indices: list[int], nearest: list[int], source: int
+) -> None:
+    """Breadth-first search out of a new home, only into sectors it's closer to
+    than any earlier home, updating `nearest` as it goes."""
+    nearest[source] = 0
+    queue = [source]
+    head = 0
+    while head < len(queue):
+        row = queue[head]
+        head += 1
+        for neighbor in indices[indptr[row] : indptr[row + 1]]:
+            if nearest[neighbor] > nearest[row] + 1:
+                nearest[neighbor] = nearest[row] + 1
+                queue.append(neighbor)
+
+
+def pick_homes(
+    graph: SectorGraph, count: int, candidates: np.ndarray | None = None
+) -> list[int]:
+    """Spread home sectors out: the first is random, and each one after is the
+    sector furthest (in jumps) from every home picked so far. Only rows set in
+    `candidates` can be picked, if given.
+
+    One array of distances to the nearest home is kept, and each new home only
+    walks the sectors it becomes the nearest home for. That's usually a small
+    part of the graph, but can be all of it, so the worst case is one pass over
+    sectors plus connections per home."""
+    if candidates is None:
+        candidates = np.ones(len(graph.sectors), dtype=bool)
+    rows = np.flatnonzero(candidates)
+    if len(rows) == 0:
+        return []
+    indptr, indices = graph.indptr.tolist(), graph.indices.tolist()
+    # sectors none of the homes can reach are as far away as it gets
+    nearest = [len(graph.sectors)] * len(graph.sectors)
+    homes = [int(rows[random.randrange(len(rows))])]
+    _walk_closer(indptr, indices, nearest, homes[0])
+    while len(homes) < min(count, len(rows)):
+        home = int(np.argmax(np.where(candidates, nearest, -1)))
+        homes.append(home)
+        _walk_closer(indptr, indices, nearest, home)
+    return homes
+
+
+def assign_territories(galaxy: Galaxy, factions: list[str]) -> Territory:
+    """Give every generated sector to the faction whose home is the fewest jumps
+    away. One multi-source pass over sectors plus connections, after picking the
+    homes. Imported sectors keep their vanilla owners, so they're left unclaimed
+    and are never homes."""
+    graph = build_sector_graph(galaxy)
+    imported = np.array(
+        [galaxy.clusters[sec.cluster_id].imported for sec in graph.sectors],
+        dtype=bool,
+    )
+    homes = pick_homes(graph, len(factions), candidates=~imported)
+    owners, distances = _bfs(graph, homes)
+    # the base game already says who owns these. territories still reach
+    # across them
+    owners[imported] = UNCLAIMED
+    return Territory(
+        factions=factions[: len(homes)],
+        sectors=graph.sectors,
+        owners=owners,
+        homes=np.array(homes, dtype=np.int64),
+        distances=distances,
+    )
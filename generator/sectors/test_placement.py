@@ -0,0 +1,55 @@
+import pytest
+
+from config.models import Config
+from generator.sectors.generator import SectorGenerationException, SectorGenerator
+from generator.sectors.models import Galaxy, Hex, Position
+from generator.sectors.placement import PlacementEngine
+from testing.shapes import hex_factory
+
+
+def test_place_cluster_contiguous() -> None:
+    center = hex_factory(0, 0)
+    grid = {center, *[Hex(center=x) for x in center.neighbor_positions]}
+    engine = PlacementEngine(grid, set())
+
+    placed = engine.place_cluster(3)
+    assert len(placed) == 3
+    assert engine.free_count == 4
+    assert all([not engine.is_free(pos) for pos in placed])
+    neighbors = {
+        Position.round(x) for pos in placed for x in Hex(center=pos).neighbor_positions
+    }
+    assert all([pos in neighbors for pos in placed]), "Sectors touch each other"
+
+
+def test_place_cluster_shrinks_to_fit() -> None:
+    """A seed boxed in by taken hexes gets a smaller cluster instead of failing."""
+    center = hex_factory(0, 0)
+    grid = {center, *[Hex(center=x) for x in center.neighbor_positions]}
+    engine = PlacementEngine(grid, set(center.neighbor_positions[1:]))
+
+    assert engine.place_cluster(3, seed=center.center) == [
+        Position(0, 0, 0),
+        Position.round(center.neighbor_positions[0]),
+    ]
+    assert engine.place_cluster(3) == []
+
+
+def test_full_density_generation() -> None:
+    """Filling every hex of the grid finishes in one go."""
+    galaxy = Galaxy(clusters={}, highways=[])
+    gen = SectorGenerator(Config(sector_count=75), galaxy)
+    gen._generate_hex_grid()
+    # the grid is sized from the config, so ask for more once it's built
+    capacity = len(gen.hex_grid)
+    gen.config.sector_count = capacity
+    gen._generate_clusters_and_sectors()
+    assert galaxy.sector_count == capacity
+    assert len({sec.position for sec in galaxy.sector_list}) == capacity
+    assert gen.placement.free_count == 0
+
+    gen = SectorGenerator(Config(sector_count=75), Galaxy(clusters={}, highways=[]))
+    gen._generate_hex_grid()
+    gen.config.sector_count = capacity + 1
+    with pytest.raises(SectorGenerationException):
+        gen._generate_clusters_and_sectors()
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from config.models import Config, RegionSettings
+from generator.sectors.generator import SectorGenerator
+from generator.sectors.models import Cluster, Galaxy, Position, Region, Sector
+from generator.sectors.noise import fractal_noise, value_noise
+from generator.sectors.regions import assign_regions
+from mod_writer.mod_writer import ModWriter
+
+
+def test_noise_range_and_determinism() -> None:
+    rng = np.random.default_rng(0)
+    x, z = rng.uniform(-50, 50, 1_000), rng.uniform(-50, 50, 1_000)
+    for noise in (value_noise(x, z, 7), fractal_noise(x, z, 7, octaves=4)):
+        assert noise.min() >= 0 and noise.max() <= 1
+    assert np.array_equal(fractal_noise(x, z, 7), fractal_noise(x, z, 7))
+    assert not np.array_equal(fractal_noise(x, z, 7), fractal_noise(x, z, 8))
+    # lattice points are one unit apart, so nearby points should be close
+    assert np.abs(value_noise(x + 0.001, z, 7) - value_noise(x, z, 7)).max() < 0.01
+
+
+def test_region_settings_bounds() -> None:
+    for bad in [{"noise_scale": 0}, {"noise_scale": -1}, {"octaves": 0}]:
+        with pytest.raises(ValidationError):
+            RegionSettings(**bad)
+
+
+def test_regions_follow_thresholds() -> None:
+    clusters = [
+        Cluster(
+            id=i,
+            sectors={
+                1: Sector(id=1, position=Position(i * 500_000, 0, 0), cluster_id=i)
+            },
+        )
+        for i in range(20)
+    ]
+    assign_regions(
+        clusters, RegionSettings(asteroid_threshold=0, nebula_threshold=1), 3
+    )
+    # every sector clears 0 and none clear 1
+    for cluster in clusters:
+        assert [region.nebula for region in cluster.regions] == [False]
+        assert cluster.regions[0].label == f"Cluster_{cluster.id:02}_Region001"
+
+    assign_regions(
+        clusters, RegionSettings(asteroid_threshold=1, nebula_threshold=1), 3
+    )
+    assert all(len(cluster.regions) == 0 for cluster in clusters)
+
+
+def test_imported_clusters_keep_regions() -> None:
+    vanilla = Region(
+        1, cluster_id=1, position=Position(0, 0, 0), resources=["ore"], nebula=True
+    )
+    cluster = Cluster(
+        id=1,
+        sectors={1: Sector(id=1, position=Position(0, 0, 0), cluster_id=1)},
+        regions=[vanilla],
+        imported=True,
+    )
+    assign_regions([cluster], RegionSettings(asteroid_threshold=0), 3)
+    assert cluster.regions == [vanilla]
+
+
+def test_regenerated_cluster_gets_new_regions() -> None:
+    config = Config(
+        sector_count=30, regions=RegionSettings(asteroid_threshold=0, seed=11)
+    )
+    generator = SectorGenerator(config, Galaxy(clusters={}, highways=[]))
+    generator.generate()
+    assert generator.region_seed == 11
+
+    changes = generator.regenerate_cluster(0)
+    cluster = changes.clusters[0]
+    # with a threshold of 0 every sector gets a field, wherever it ended up
+    assert sorted(tuple(region.position) for region in cluster.regions) == sorted(
+        tuple(sector.position) for sector in cluster.sector_list
+    )
+
+
+def test_region_definitions_written(tmp_path) -> None:
+    cluster = Cluster(
+        id=1, sectors={1: Sector(id=1, position=Position(0, 0, 0), cluster_id=1)}
+    )
+    assign_regions([cluster], RegionSettings(asteroid_threshold=0), 5)
+    writer = ModWriter(Galaxy(clusters={1: cluster}, highways=[]))
+
+    macro = writer._build_cluster_macro(cluster)
+    refs = [conn.get("ref") for conn in macro.connections.iterchildren()]
+    assert refs == ["clusters", "regions"]
+    definitions = list(writer._build_region_definitions().iterchildren())
+    assert [x.get("name") for x in definitions] == ["xu_rand_cluster_01_region001"]
+
+
+def test_nebulas_and_fields_look_different() -> None:
+    position = Position(0, 0, 0)
+    field = Region(1, cluster_id=1, position=position, resources=["ore"])
+    nebula = Region(
+        2, cluster_id=1, position=position, resources=["helium"], nebula=True
+    )
+    cluster = Cluster(
+        id=1,
+        sectors={1: Sector(id=1, position=position, cluster_id=1)},
+        regions=[field, nebula],
+    )
+    writer = ModWriter(Galaxy(clusters={1: cluster}, highways=[]))
+
+    field_xml, nebula_xml = writer._build_region_definitions().iterchildren()
+    assert [x.tag for x in field_xml.fields.iterchildren()] == ["asteroid"] * 3
+    assert field_xml.fields.asteroid.get("groupref") == "asteroid_ore_l"
+    assert [x.tag for x in nebula_xml.fields.iterchildren()] == ["volumetricfog"]
+    assert nebula_xml.fields.volumetricfog.get("medium") == "fog_helium_nebula"
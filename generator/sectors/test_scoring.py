@@ -0,0 +1,109 @@
+import pickle
+
+import pytest
+
+from config.models import Config, QualityThresholds
+from generator.sectors.generator import SectorGenerator
+from generator.sectors.models import Cluster, Galaxy, Position
+from generator.sectors.scoring import (
+    ConnectivityMetric,
+    GenerationProgress,
+    LayoutBalanceMetric,
+    SeedRejectedException,
+    SeedScorer,
+    SingleSectorClusterMetric,
+)
+from testing.shapes import sector_factory
+
+
+def test_single_sector_cluster_metric() -> None:
+    metric = SingleSectorClusterMetric(max_ratio=0.5)
+    for i in range(3):
+        metric.on_cluster(Cluster(id=i, sectors={1: sector_factory(id=1)}))
+
+    assert metric.value == 1
+    assert metric.can_still_pass(
+        GenerationProgress(remaining_sectors=6, grid_radius=1)
+    ), "Three two-sector clusters would still bring the ratio down to 0.5"
+    assert not metric.can_still_pass(
+        GenerationProgress(remaining_sectors=4, grid_radius=1)
+    )
+
+
+def test_single_sector_cluster_metric_last_sector() -> None:
+    metric = SingleSectorClusterMetric(max_ratio=0.5)
+    metric.on_cluster(Cluster(id=1, sectors={1: sector_factory(id=1)}))
+    assert metric.can_still_pass(
+        GenerationProgress(remaining_sectors=1, grid_radius=1)
+    ), "The last cluster can still get two sectors, bringing the ratio to 0.5"
+
+
+def test_layout_balance_metric() -> None:
+    metric = LayoutBalanceMetric(max_offset=0.1)
+    metric.on_cluster(
+        Cluster(id=1, sectors={1: sector_factory(id=1, position=Position(100, 0, 0))})
+    )
+
+    assert metric.can_still_pass(
+        GenerationProgress(remaining_sectors=1, grid_radius=100)
+    ), "One sector on the opposite rim would balance it out"
+    assert not metric.can_still_pass(
+        GenerationProgress(remaining_sectors=0, grid_radius=100)
+    )
+    assert metric.value == 1
+
+
+def test_connectivity_metric() -> None:
+    metric = ConnectivityMetric(max_groups=1)
+    for i in range(3):
+        metric.on_cluster(Cluster(id=i))
+    assert metric.value == 3
+    assert metric.can_still_pass(GenerationProgress(0, 1)), "Gates aren't in yet"
+    assert not metric.can_still_pass(GenerationProgress(0, 1, highways_done=True))
+
+
+def test_generation_rejects_early() -> None:
+    """Generation stops at the first single-sector cluster when none are allowed."""
+    config = Config(
+        sector_count=75,
+        quality=QualityThresholds(max_single_sector_cluster_ratio=0),
+    )
+    galaxy = Galaxy(clusters={}, highways=[])
+    gen = SectorGenerator(config, galaxy)
+
+    with pytest.raises(SeedRejectedException) as exc:
+        gen.generate()
+    assert exc.value.metric == "single_sector_cluster_ratio"
+    assert galaxy.cluster_list[-1].sector_count == 1
+    assert galaxy.sector_count < 75, "The rest of the seed was never generated"
+
+
+def test_generation_passes_loose_thresholds() -> None:
+    config = Config(
+        sector_count=30,
+        quality=QualityThresholds(
+            max_single_sector_cluster_ratio=1,
+            max_layout_offset=1,
+            max_disconnected_groups=30,
+        ),
+    )
+    gen = SectorGenerator(config, Galaxy(clusters={}, highways=[]))
+    gen.generate()
+    assert set(gen.scorer.scores.keys()) == {
+        "single_sector_cluster_ratio",
+        "layout_offset",
+        "disconnected_groups",
+    }
+
+
+def test_empty_scorer() -> None:
+    scorer = SeedScorer()
+    scorer.check(GenerationProgress(0, 0, highways_done=True))
+    assert scorer.scores == {}
+
+
+def test_rejection_pickles() -> None:
+    """Rejections have to make it back out of worker processes."""
+    e = pickle.loads(pickle.dumps(SeedRejectedException("layout_offset", 0.5)))
+    assert (e.metric, e.value) == ("layout_offset", 0.5)
+    assert str(e) == "layout_offset can no longer pass (at 0.500)"
@@ -37,6 +37,8 @@ def test_hex_generation() -> None:
     assert len(gen.hex_grid) == len(
         list(unique_positions)
     ), "Every hex has a unique position"
+    # 8 rings out, straight along z
+    assert round(gen.grid_radius) == 2_000_000, "Grid radius is measured on x and z"
 
 
 def test_basic_sector_gen() -> None:
@@ -161,3 +163,53 @@ def test_cluster_highway_gen_multiple_clusters() -> None:
     assert all(
         [any([i in id for id in ids]) for i in range(1, 5)]
     ), "All clusters have at least one highway"
+
+
+def test_regenerate_cluster() -> None:
+    """Re-rolling a cluster leaves the rest of the galaxy alone."""
+    config = Config(sector_count=30)
+    galaxy = Galaxy(clusters={}, highways=[])
+    gen = SectorGenerator(config, galaxy)
+    gen.generate()
+
+    target = galaxy.clusters[3]
+    old_labels = {sec.label for sec in target.sector_list}
+    other_positions = {
+        sec.compound_id: sec.position
+        for sec in galaxy.sector_list
+        if sec.cluster_id != 3
+    }
+    untouched_gates = [
+        hw for hw in galaxy.highways if 3 not in break_compound_id(hw.id)
+    ]
+    touched_labels = sorted(
+        hw.label for hw in galaxy.highways if 3 in break_compound_id(hw.id)
+    )
+
+    changes = gen.regenerate_cluster(3, sector_count=1)
+
+    assert target.sector_count == 1
+    assert target.inter_sector_highways == []
+    assert changes.removed_sectors == sorted(old_labels - {target.sectors[0].label})
+    assert {
+        sec.compound_id: sec.position
+        for sec in galaxy.sector_list
+        if sec.cluster_id != 3
+    } == other_positions, "Other sectors don't move"
+    assert all(
+        [any([hw is old for hw in galaxy.highways]) for old in untouched_gates]
+    ), "Gates elsewhere are kept as they were"
+    assert sorted(hw.label for hw in changes.highways) == touched_labels
+    assert len({sec.position for sec in galaxy.sector_list}) == galaxy.sector_count
+
+
+def test_regenerate_cluster_move() -> None:
+    config = Config(sector_count=10)
+    galaxy = Galaxy(clusters={}, highways=[])
+    gen = SectorGenerator(config, galaxy)
+    gen.generate()
+
+    taken = {sec.position for sec in galaxy.sector_list}
+    free = next(hex.center for hex in gen.hex_grid if hex.center not in taken)
+    gen.regenerate_cluster(0, position=free)
+    assert galaxy.clusters[0].sectors[0].position == free
@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from config.models import Config, GalaxyShape
+from generator.sectors.generator import SectorGenerationException, SectorGenerator
+from generator.sectors.models import Galaxy
+from generator.sectors.shapes import AliasTable, shape_weights
+
+
+def test_alias_table() -> None:
+    random.seed(0)
+    table = AliasTable(np.array([1.0, 0.0, 3.0]))
+    draws = np.bincount([table.draw() for _ in range(8_000)], minlength=3)
+    assert draws[1] == 0, "Zero weights are never drawn"
+    assert 2.7 < draws[2] / draws[0] < 3.3
+
+
+def test_ring_weights() -> None:
+    shape = GalaxyShape(kind="ring", ring_radius=0.5, width=0.1)
+    x = np.array([0.0, 50.0, 100.0])
+    weights = shape_weights(shape, x, np.zeros(3))
+    assert weights[0] == 0, "The middle of a ring is masked out"
+    assert weights[1] == 1
+    assert weights[2] == 0
+
+
+def test_round_weights() -> None:
+    weights = shape_weights(GalaxyShape(), np.arange(5.0), np.arange(5.0))
+    assert list(weights) == [1] * 5
+
+
+def test_shaped_generation() -> None:
+    """Sectors only land on hexes the shape keeps, and there's still room for all."""
+    shape = GalaxyShape(kind="ring")
+    galaxy = Galaxy(clusters={}, highways=[])
+    gen = SectorGenerator(Config(sector_count=75, shape=shape), galaxy)
+    gen._generate_hex_grid()
+    gen._generate_clusters_and_sectors()
+
+    assert galaxy.sector_count >= 75
+    assert all([sec.position in gen.placement.grid for sec in galaxy.sector_list])
+    assert len(gen.placement.grid) < len(gen.hex_grid)
+
+
+def test_shape_bounds() -> None:
+    for bad in [{"cutoff": 1.5}, {"cutoff": 1}, {"width": 0}, {"arms": 0}]:
+        with pytest.raises(ValidationError):
+            GalaxyShape(kind="ring", **bad)
+
+    # valid, but too thin for any hex to land on
+    config = Config(
+        sector_count=30, shape=GalaxyShape(kind="ring", width=0.0001, cutoff=0.99)
+    )
+    gen = SectorGenerator(config, Galaxy(clusters={}, highways=[]))
+    with pytest.raises(SectorGenerationException):
+        gen._generate_hex_grid()
@@ -0,0 +1,60 @@
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from config.models import Config
+from generator.sectors.generator import SectorGenerator
+from generator.sectors.models import Galaxy
+from generator.sectors.snapshot import SharedGalaxy, SnapshotHandle, attach
+
+
+def generated_galaxy() -> Galaxy:
+    galaxy = Galaxy(clusters={}, highways=[])
+    SectorGenerator(Config(sector_count=30), galaxy).generate()
+    return galaxy
+
+
+def count_gates(handle: SnapshotHandle) -> int:
+    with attach(handle) as view:
+        return len(view.highway_cluster_pairs())
+
+
+def check_snapshot(galaxy: Galaxy, handle: SnapshotHandle) -> None:
+    with attach(handle) as view:
+        assert view.sector_count == galaxy.sector_count
+        assert view.cluster_count == galaxy.cluster_count
+        assert [view.sector_position(i) for i in range(view.sector_count)] == [
+            sec.position for sec in galaxy.sector_list
+        ]
+        assert [tuple(x) for x in view.highway_cluster_pairs().tolist()] == [
+            (hw.entry_cluster.id, hw.exit_cluster.id) for hw in galaxy.highways
+        ]
+        cluster = galaxy.clusters[int(view.cluster_ids[0])]
+        assert len(view.sectors_in_cluster(cluster.id)) == cluster.sector_count
+        assert np.allclose(view.cluster_positions()[0], tuple(cluster.position))
+        assert not view.columns["sector_positions"].flags.writeable
+
+
+def test_shared_memory_snapshot() -> None:
+    galaxy = generated_galaxy()
+    with SharedGalaxy(galaxy) as shared:
+        check_snapshot(galaxy, shared.handle)
+
+        with Pool(2) as pool:
+            counts = pool.map(count_gates, [shared.handle] * 4)
+        assert counts == [len(galaxy.highways)] * 4
+
+
+def test_memory_mapped_snapshot(tmp_path) -> None:
+    galaxy = generated_galaxy()
+    path = os.path.join(tmp_path, "galaxy.snapshot")
+    with SharedGalaxy(galaxy, path=path) as shared:
+        check_snapshot(galaxy, shared.handle)
+
+
+def test_empty_snapshot() -> None:
+    with SharedGalaxy(Galaxy(clusters={}, highways=[])) as shared:
+        with attach(shared.handle) as view:
+            assert view.sector_count == 0
+            assert view.highway_cluster_pairs().shape == (0, 2)
@@ -0,0 +1,164 @@
+import os
+import random
+
+import numpy as np
+
+from config.models import Config
+from generator.sectors.generator import SectorGenerator
+from generator.sectors.models import (
+    UNCLAIMED,
+    Cluster,
+    Galaxy,
+    InterClusterConnector,
+    LocationInSector,
+    Position,
+    Sector,
+)
+from generator.sectors.territory import (
+    _bfs,
+    assign_territories,
+    build_sector_graph,
+    pick_homes,
+)
+from mod_writer.mod_writer import LIBRARIES_LOC, ModWriter
+
+
+def chain_galaxy(length: int) -> Galaxy:
+    """Single-sector clusters gated together in a line."""
+    clusters = {
+        i: Cluster(
+            id=i,
+            sectors={1: Sector(id=1, position=Position(0, 0, 0), cluster_id=i)},
+        )
+        for i in range(length)
+    }
+    highways = [
+        InterClusterConnector(
+            entry_point=LocationInSector(
+                sector=clusters[i].sectors[1], position=Position(0, 0, 0)
+            ),
+            exit_point=LocationInSector(
+                sector=clusters[i + 1].sectors[1], position=Position(0, 0, 0)
+            ),
+            entry_cluster=clusters[i],
+            exit_cluster=clusters[i + 1],
+        )
+        for i in range(length - 1)
+    ]
+    return Galaxy(clusters=clusters, highways=highways)
+
+
+def test_sector_graph() -> None:
+    graph = build_sector_graph(chain_galaxy(3))
+    neighbors = [
+        sorted(graph.indices[graph.indptr[i] : graph.indptr[i + 1]].tolist())
+        for i in range(3)
+    ]
+    assert neighbors == [[1], [0, 2], [1]]
+
+
+def test_assign_territories() -> None:
+    territory = assign_territories(chain_galaxy(9), ["argon", "teladi"])
+
+    assert territory.factions == ["argon", "teladi"]
+    assert UNCLAIMED not in territory.owners.tolist()
+    for faction, home in enumerate(territory.homes.tolist()):
+        assert territory.owners[home] == faction
+        assert territory.distances[home] == 0
+    # the second home is as far from the first as the chain allows
+    first, second = territory.homes.tolist()
+    assert abs(first - second) >= 4
+    # every sector is owned by whichever home is closer
+    for row, owner in enumerate(territory.owners.tolist()):
+        assert abs(row - territory.homes[owner]) == min(
+            abs(row - home) for home in territory.homes.tolist()
+        )
+
+
+def test_pick_homes_matches_full_searches() -> None:
+    """Walking out from each new home gives the same picks as searching from
+    every home each time."""
+    galaxy = chain_galaxy(30)
+    # a second, unconnected chain
+    galaxy.highways = galaxy.highways[:19] + galaxy.highways[20:]
+    graph = build_sector_graph(galaxy)
+
+    random.seed(4)
+    homes = pick_homes(graph, 5)
+    random.seed(4)
+    expected = [random.randrange(len(graph.sectors))]
+    while len(expected) < 5:
+        _, distances = _bfs(graph, expected)
+        distances[distances < 0] = len(graph.sectors)
+        distances[expected] = -1
+        expected.append(int(np.argmax(distances)))
+    assert homes == expected
+
+
+def test_imported_sectors_keep_owners(tmp_path) -> None:
+    galaxy = chain_galaxy(6)
+    for i in (0, 1, 2):
+        galaxy.clusters[i].imported = True
+    territory = assign_territories(galaxy, ["argon", "teladi"])
+    assert all(home >= 3 for home in territory.homes.tolist())
+    assert territory.owners.tolist()[:3] == [UNCLAIMED] * 3
+    assert UNCLAIMED not in territory.owners.tolist()[3:]
+
+    galaxy.territory = territory
+    writer = ModWriter(galaxy, base_maps_location=str(tmp_path))
+    root = writer._build_map_defaults(territory)
+    assert [x.get("macro") for x in root.iterchildren()] == [
+        f"Cluster_0{i}_Sector001_macro" for i in (3, 4, 5)
+    ], "No datasets, and so no removes, for imported sectors"
+
+
+def test_unreachable_sectors() -> None:
+    galaxy = chain_galaxy(4)
+    galaxy.highways = galaxy.highways[:1]
+    territory = assign_territories(galaxy, ["argon"])
+    home = int(territory.homes[0])
+    owned = {row for row, owner in enumerate(territory.owners.tolist()) if owner == 0}
+    assert owned == ({0, 1} if home in (0, 1) else {home})
+    assert territory.sector_owners[galaxy.clusters[3].sectors[1].compound_id] == (
+        "argon" if home == 3 else None
+    )
+
+
+def test_generated_territories(tmp_path) -> None:
+    galaxy = Galaxy(clusters={}, highways=[])
+    SectorGenerator(
+        Config(sector_count=30, factions=["argon", "split"]), galaxy
+    ).generate()
+    assert galaxy.territory is not None
+    assert len(galaxy.territory.owners) == galaxy.sector_count
+    assert set(np.unique(galaxy.territory.owners).tolist()) >= {0, 1}
+
+    writer = ModWriter(galaxy)
+    writer.output_location = str(tmp_path)
+    writer.write()
+    with open(os.path.join(tmp_path, LIBRARIES_LOC, "mapdefaults.xml")) as file:
+        defaults = file.read()
+    assert 'faction="argon"' in defaults
+    assert 'faction="split"' in defaults
+
+
+def test_territories_follow_regenerated_cluster(tmp_path) -> None:
+    galaxy = Galaxy(clusters={}, highways=[])
+    gen = SectorGenerator(Config(sector_count=30, factions=["argon", "split"]), galaxy)
+    gen.generate()
+    writer = ModWriter(galaxy)
+    writer.output_location = str(tmp_path)
+    writer.write()
+
+    target = max(galaxy.cluster_list, key=lambda x: x.sector_count)
+    writer.update(gen.regenerate_cluster(target.id, sector_count=1))
+
+    assert galaxy.territory is not None
+    assert len(galaxy.territory.owners) == galaxy.sector_count
+    assert all(
+        [a is b for a, b in zip(galaxy.territory.sectors, galaxy.sector_list)]
+    ), "The territory has the new sectors, not the removed ones"
+    with open(os.path.join(tmp_path, LIBRARIES_LOC, "mapdefaults.xml")) as file:
+        defaults = file.read()
+    assert defaults.count("<dataset") == galaxy.sector_count
+    assert f'"{target.sectors[0].label}_macro"' in defaults
@@ -1,14 +1,31 @@
 from config.config_maker import read_config
 from generator.sectors.generator import SectorGenerator
-from generator.sectors.models import Galaxy
+from generator.sectors.models import Galaxy, Hex
+from mod_reader.map_reader import MapReader
 from mod_writer.mod_writer import ModWriter
 
-
 config = read_config()
-galaxy = Galaxy()
+galaxy = Galaxy(clusters={}, highways=[])
+occupied_hexes: set[Hex] = set()
+
+if config.vanilla_maps_location is not None:
+    reader = MapReader(
+        config.vanilla_maps_location,
+        cluster_ids=(
+            set(config.vanilla_cluster_ids)
+            if config.vanilla_cluster_ids is not None
+            else None
+        ),
+    )
+    galaxy = reader.read()
+    occupied_hexes = reader.occupied_hexes
 
-sector_gen = SectorGenerator(config, galaxy)
+sector_gen = SectorGenerator(config, galaxy, occupied_hexes=occupied_hexes)
 sector_gen.generate()
 
-writer = ModWriter(galaxy)
+writer = ModWriter(
+    galaxy,
+    base_maps_location=config.vanilla_maps_location if config.export_diff else None,
+)
 writer.write()
+writer.validate()
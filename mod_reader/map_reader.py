@@ -0,0 +1,194 @@
+import os
+import re
+from collections.abc import Iterator
+from typing import NamedTuple
+
+from lxml import etree
+
+from generator.sectors.helpers import snap_to_hex_lattice
+from generator.sectors.models import (
+    Cluster,
+    Galaxy,
+    Hex,
+    InterClusterConnector,
+    LocationInSector,
+    Position,
+    Sector,
+)
+from xml_helpers import release_element
+
+CLUSTER_MACRO_PATTERN = re.compile(r"Cluster_(\d+)_macro$")
+SECTOR_MACRO_PATTERN = re.compile(r"Cluster_(\d+)_Sector(\d+)_macro$")
+SECTOR_CONNECTION_PATTERN = re.compile(r"Cluster_(\d+)_Sector(\d+)_connection$")
+GATE_PATTERN = re.compile(r"ClusterGate(\d+)To(\d+)")
+
+CONNECTION = "connection"
+MACRO = "macro"
+NAME = "name"
+OFFSET = "offset"
+PATH = "path"
+POSITION = "position"
+REF = "ref"
+
+
+class MapReadException(Exception):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class _GateRecord(NamedTuple):
+    entry_path: str
+    exit_path: str
+
+
+def _read_position(connection: etree._Element) -> Position:
+    pos = connection.find(f"{OFFSET}/{POSITION}")
+    if pos is None:
+        return Position(0, 0, 0)
+    return Position(
+        float(pos.get("x", 0)), float(pos.get("y", 0)), float(pos.get("z", 0))
+    )
+
+
+class MapReader:
+    """Streams the vanilla map files (`galaxy.xml`, `clusters.xml`, `sectors.xml`)
+    into a `Galaxy` that `SectorGenerator` can then fill out."""
+
+    def __init__(
+        self,
+        maps_location: str,
+        *,
+        cluster_ids: set[int] | None = None,
+        hex_radius: float = 250_000,
+    ) -> None:
+        self.maps_location = maps_location
+        # only keep these clusters, or everything if not given
+        self.cluster_ids = cluster_ids
+        self.hex_radius = hex_radius
+        self.occupied_hexes: set[Hex] = set()
+
+        self._zone_positions: dict[str, Position] = {}
+        self._sector_offsets: dict[int, dict[int, Position]] = {}
+        self._cluster_offsets: dict[int, Position] = {}
+        self._gates: list[_GateRecord] = []
+
+    def _iter_elements(self, file_name: str, tag: str) -> Iterator[etree._Element]:
+        path = os.path.join(self.maps_location, file_name)
+        if not os.path.exists(path):
+            raise MapReadException(f"Missing map file {path}")
+        for _, elem in etree.iterparse(path, events=("end",), tag=tag):
+            yield elem
+            release_element(elem)
+
+    def _keep_cluster(self, cluster_id: int) -> bool:
+        return self.cluster_ids is None or cluster_id in self.cluster_ids
+
+    def _read_sector_map(self) -> None:
+        # all we need from here are zone offsets, to place gates within sectors
+        for conn in self._iter_elements("sectors.xml", CONNECTION):
+            if conn.get(REF) == "zones":
+                self._zone_positions[conn.get(NAME, "")] = _read_position(conn)
+
+    def _read_cluster_map(self) -> None:
+        for conn in self._iter_elements("clusters.xml", CONNECTION):
+            macro = conn.find(MACRO)
+            if macro is None:
+                continue
+            match = SECTOR_MACRO_PATTERN.search(macro.get(REF, ""))
+            if match is None:
+                continue
+            cluster_id, sector_id = int(match.group(1)), int(match.group(2))
+            if not self._keep_cluster(cluster_id):
+                continue
+            self._sector_offsets.setdefault(cluster_id, {})[sector_id] = _read_position(
+                conn
+            )
+
+    def _read_galaxy_map(self) -> None:
+        for conn in self._iter_elements("galaxy.xml", CONNECTION):
+            macro = conn.find(MACRO)
+            if macro is None:
+                continue
+            if GATE_PATTERN.search(conn.get(NAME, "")):
+                self._gates.append(
+                    _GateRecord(
+                        entry_path=conn.get(PATH, ""),
+                        exit_path=macro.get(PATH, ""),
+                    )
+                )
+                continue
+            match = CLUSTER_MACRO_PATTERN.search(macro.get(REF, ""))
+            if match is not None and self._keep_cluster(int(match.group(1))):
+                self._cluster_offsets[int(match.group(1))] = _read_position(conn)
+
+    def _build_clusters(self) -> dict[int, Cluster]:
+        clusters: dict[int, Cluster] = {}
+        for cluster_id, cluster_offset in self._cluster_offsets.items():
+            cluster = Cluster(id=cluster_id, imported=True)
+            for sector_id, sector_offset in self._sector_offsets.get(
+                cluster_id, {}
+            ).items():
+                sector = Sector(
+                    id=sector_id,
+                    position=cluster_offset + sector_offset,
+                    cluster_id=cluster_id,
+                    radius=self.hex_radius,
+                )
+                cluster.sectors[sector_id] = sector
+                self.occupied_hexes.add(
+                    Hex(
+                        center=snap_to_hex_lattice(sector.position, self.hex_radius),
+                        radius=self.hex_radius,
+                    )
+                )
+            if cluster.sector_count > 0:
+                clusters[cluster_id] = cluster
+        return clusters
+
+    def _locate(
+        self, path: str, clusters: dict[int, Cluster]
+    ) -> LocationInSector | None:
+        sector: Sector | None = None
+        position = Position(0, 0, 0)
+        for segment in path.split("/"):
+            # zone connection names end with their sector's, so check them first
+            if segment in self._zone_positions:
+                position = self._zone_positions[segment]
+                continue
+            match = SECTOR_CONNECTION_PATTERN.search(segment)
+            if match is not None:
+                cluster = clusters.get(int(match.group(1)))
+                if cluster is None:
+                    return None
+                sector = cluster.sectors.get(int(match.group(2)))
+        if sector is None:
+            return None
+        return LocationInSector(sector=sector, position=position)
+
+    def _build_highways(
+        self, clusters: dict[int, Cluster]
+    ) -> list[InterClusterConnector]:
+        highways: list[InterClusterConnector] = []
+        for gate in self._gates:
+            entry_point = self._locate(gate.entry_path, clusters)
+            exit_point = self._locate(gate.exit_path, clusters)
+            # gates to clusters we didn't keep get dropped and regenerated
+            if entry_point is None or exit_point is None:
+                continue
+            highways.append(
+                InterClusterConnector(
+                    entry_point=entry_point,
+                    exit_point=exit_point,
+                    entry_cluster=clusters[entry_point.sector.cluster_id],
+                    exit_cluster=clusters[exit_point.sector.cluster_id],
+                    imported=True,
+                )
+            )
+        return highways
+
+    def read(self) -> Galaxy:
+        self._read_sector_map()
+        self._read_cluster_map()
+        self._read_galaxy_map()
+        clusters = self._build_clusters()
+        return Galaxy(clusters=clusters, highways=self._build_highways(clusters))
@@ -0,0 +1,230 @@
+import os
+
+import pytest
+from lxml import etree
+from pydantic import ValidationError
+
+from config.models import Config, RegionSettings
+from generator.sectors.generator import SectorGenerator
+from generator.sectors.helpers import snap_to_hex_lattice
+from generator.sectors.models import Position
+from mod_reader.map_reader import MapReader
+from mod_writer.mod_writer import MAPS_LOC, ModWriter
+
+GALAXY_XML = """<?xml version="1.0" encoding="utf-8"?>
+<macros>
+  <macro name="XU_EP2_universe_macro" class="galaxy">
+    <component ref="standardgalaxy" />
+    <connections>
+      <connection name="Cluster_01_connection" ref="clusters">
+        <offset><position x="0" y="0" z="0" /></offset>
+        <macro ref="Cluster_01_macro" connection="galaxy" />
+      </connection>
+      <connection name="Cluster_02_connection" ref="clusters">
+        <offset><position x="1000000" y="0" z="0" /></offset>
+        <macro ref="Cluster_02_macro" connection="galaxy" />
+      </connection>
+      <connection name="Cluster_03_connection" ref="clusters">
+        <offset><position x="0" y="0" z="1000000" /></offset>
+        <macro ref="Cluster_03_macro" connection="galaxy" />
+      </connection>
+      <connection name="ClusterGate001To002" ref="destination" path="../Cluster_01_connection/Cluster_01_Sector001_connection/Zone001_Cluster_01_Sector001_connection/connection_ClusterGate001To002">
+        <macro connection="destination" path="../../../../../Cluster_02_connection/Cluster_02_Sector001_connection/Zone001_Cluster_02_Sector001_connection/connection_ClusterGate002To001" />
+      </connection>
+      <connection name="ClusterGate001To003" ref="destination" path="../Cluster_01_connection/Cluster_01_Sector002_connection/connection_ClusterGate001To003">
+        <macro connection="destination" path="../../../../../Cluster_03_connection/Cluster_03_Sector001_connection/connection_ClusterGate003To001" />
+      </connection>
+    </connections>
+  </macro>
+</macros>
+"""
+
+CLUSTERS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<macros>
+  <macro name="Cluster_01_macro" class="cluster">
+    <component ref="standardcluster" />
+    <connections>
+      <connection name="Cluster_01_Sector001_connection" ref="sectors">
+        <offset><position x="0" y="0" z="0" /></offset>
+        <macro ref="Cluster_01_Sector001_macro" connection="cluster" />
+      </connection>
+      <connection name="Cluster_01_Sector002_connection" ref="sectors">
+        <offset><position x="216506" y="0" z="125000" /></offset>
+        <macro ref="Cluster_01_Sector002_macro" connection="cluster" />
+      </connection>
+      <connection name="Cluster_01_region001_connection" ref="regions">
+        <macro name="Cluster_01_region001_macro" connection="cluster" />
+      </connection>
+    </connections>
+  </macro>
+  <macro name="Cluster_02_macro" class="cluster">
+    <component ref="standardcluster" />
+    <connections>
+      <connection name="Cluster_02_Sector001_connection" ref="sectors">
+        <macro ref="Cluster_02_Sector001_macro" connection="cluster" />
+      </connection>
+    </connections>
+  </macro>
+  <macro name="Cluster_03_macro" class="cluster">
+    <component ref="standardcluster" />
+    <connections>
+      <connection name="Cluster_03_Sector001_connection" ref="sectors">
+        <macro ref="Cluster_03_Sector001_macro" connection="cluster" />
+      </connection>
+    </connections>
+  </macro>
+</macros>
+"""
+
+SECTORS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<macros>
+  <macro name="Cluster_01_Sector001_macro" class="sector">
+    <component ref="standardsector" />
+    <connections>
+      <connection name="Zone001_Cluster_01_Sector001_connection" ref="zones">
+        <offset><position x="20000" y="0" z="-15000" /></offset>
+        <macro ref="Zone001_Cluster_01_Sector001_macro" connection="sector" />
+      </connection>
+    </connections>
+  </macro>
+  <macro name="Cluster_02_Sector001_macro" class="sector">
+    <component ref="standardsector" />
+    <connections>
+      <connection name="Zone001_Cluster_02_Sector001_connection" ref="zones">
+        <offset><position x="-5000" y="0" z="5000" /></offset>
+        <macro ref="Zone001_Cluster_02_Sector001_macro" connection="sector" />
+      </connection>
+    </connections>
+  </macro>
+</macros>
+"""
+
+
+def write_vanilla_maps(location: str) -> None:
+    for file_name, xml in [
+        ("galaxy.xml", GALAXY_XML),
+        ("clusters.xml", CLUSTERS_XML),
+        ("sectors.xml", SECTORS_XML),
+    ]:
+        with open(os.path.join(location, file_name), "w") as file:
+            file.write(xml)
+
+
+def test_read_vanilla_maps(tmp_path) -> None:
+    write_vanilla_maps(str(tmp_path))
+    reader = MapReader(str(tmp_path))
+    galaxy = reader.read()
+
+    assert sorted(galaxy.clusters.keys()) == [1, 2, 3]
+    assert galaxy.sector_count == 4
+    assert galaxy.clusters[2].sectors[1].position == Position(1_000_000, 0, 0)
+
+    assert sorted(x.id for x in galaxy.highways) == ["1-2", "1-3"]
+    gate = next(x for x in galaxy.highways if x.id == "1-2")
+    assert gate.entry_point.position == Position(20_000, 0, -15_000)
+    assert gate.exit_point.sector is galaxy.clusters[2].sectors[1]
+
+    assert len(reader.occupied_hexes) == 4, "Every sector claims its own hex"
+
+
+def test_read_vanilla_maps_filtered(tmp_path) -> None:
+    """Gates to clusters we don't keep are dropped."""
+    write_vanilla_maps(str(tmp_path))
+    galaxy = MapReader(str(tmp_path), cluster_ids={1, 2}).read()
+
+    assert sorted(galaxy.clusters.keys()) == [1, 2]
+    assert [x.id for x in galaxy.highways] == ["1-2"]
+
+
+def test_vanilla_maps_need_diff_export() -> None:
+    with pytest.raises(ValidationError):
+        Config(sector_count=30, vanilla_maps_location="vanilla")
+    Config(sector_count=30, vanilla_maps_location="vanilla", export_diff=True)
+
+
+def test_snap_to_hex_lattice() -> None:
+    radius = 250_000
+    assert snap_to_hex_lattice(Position(10_000, 0, -10_000), radius) == Position(
+        0, 0, 0
+    )
+    snapped = snap_to_hex_lattice(Position(216_000, 0, 126_000), radius)
+    assert Position.round(snapped) == Position(216_506, 0, 125_000)
+
+
+def test_generate_around_vanilla_maps(tmp_path) -> None:
+    write_vanilla_maps(str(tmp_path))
+    reader = MapReader(str(tmp_path))
+    galaxy = reader.read()
+
+    gen = SectorGenerator(
+        Config(sector_count=30), galaxy, occupied_hexes=reader.occupied_hexes
+    )
+    gen.generate()
+
+    assert 30 <= galaxy.sector_count <= 32
+    assert galaxy.clusters[1].sector_count == 2, "Vanilla clusters are kept"
+    occupied = {Position.round(hex.center) for hex in reader.occupied_hexes}
+    new_sectors = [sec for sec in galaxy.sector_list if sec.cluster_id not in (1, 2, 3)]
+    assert all(
+        [Position.round(sec.position) not in occupied for sec in new_sectors]
+    ), "Generated sectors avoid the imported ones"
+
+
+def test_export_diff_leaves_vanilla_alone(tmp_path) -> None:
+    """Imported clusters, sectors and gates get no ops in the patch, so what we
+    didn't read (zones, regions, gate paths) survives."""
+    maps_location = os.path.join(tmp_path, "vanilla")
+    os.makedirs(maps_location)
+    write_vanilla_maps(maps_location)
+    reader = MapReader(maps_location, cluster_ids={1, 2})
+    galaxy = reader.read()
+    SectorGenerator(
+        Config(sector_count=30, regions=RegionSettings(asteroid_threshold=0)),
+        galaxy,
+        occupied_hexes=reader.occupied_hexes,
+    ).generate()
+
+    assert galaxy.clusters[1].regions == [], "Vanilla regions aren't replaced"
+
+    writer = ModWriter(galaxy, base_maps_location=maps_location)
+    writer.output_location = os.path.join(tmp_path, "output")
+    os.makedirs(writer.output_location)
+    writer.write()
+
+    touched: list[str] = []
+    for file_name in ["galaxy.xml", "clusters.xml", "sectors.xml"]:
+        diff = etree.parse(os.path.join(writer.output_location, MAPS_LOC, file_name))
+        for op in diff.getroot().iterchildren():
+            touched.append(op.get("sel"))
+            touched.extend(x.get("name") for x in op.iterchildren())
+    for name in [
+        "Cluster_01_connection",
+        "Cluster_02_connection",
+        "ClusterGate001To002",
+        "Cluster_01_macro",
+        "Cluster_01_Sector001_macro",
+        "Cluster_02_Sector001_macro",
+    ]:
+        assert not any(name in x for x in touched), f"{name} is in the patch"
+
+
+def test_regenerate_imported_cluster(tmp_path) -> None:
+    """The hexes an imported cluster's sectors snapped to are freed up again."""
+    write_vanilla_maps(str(tmp_path))
+    reader = MapReader(str(tmp_path), cluster_ids={1, 2})
+    galaxy = reader.read()
+    gen = SectorGenerator(
+        Config(sector_count=30), galaxy, occupied_hexes=reader.occupied_hexes
+    )
+    gen.generate()
+    snapped = Position.round(
+        snap_to_hex_lattice(galaxy.clusters[2].sectors[1].position, 250_000)
+    )
+    assert not gen.placement.is_free(snapped)
+    free_count = gen.placement.free_count
+
+    gen.regenerate_cluster(2, sector_count=1)
+    assert gen.placement.free_count == free_count
+    new_position = Position.round(galaxy.clusters[2].sectors[0].position)
+    assert gen.placement.is_free(snapped) or new_position == snapped
+    assert not galaxy.clusters[2].imported
@@ -1,12 +1,30 @@
+import copy
 import os
 import shutil
+from typing import NamedTuple, cast
 
 from lxml.objectify import Element, deannotate, ObjectifiedElement
 from lxml import etree
 
-from generator.sectors.models import Galaxy
+from generator.sectors.models import (
+    ChangeSet,
+    Cluster,
+    Galaxy,
+    InterClusterConnector,
+    Region,
+    Sector,
+    Territory,
+)
+from mod_writer.validate import (
+    ModValidationException,
+    library_jobs,
+    map_jobs,
+    validate_files,
+)
+from xml_helpers import release_element
 
 ASSETS_ENV_LOC = os.path.join("assets", "environments")
+LIBRARIES_LOC = "libraries"
 MAPS_LOC = os.path.join("maps", "xu_ep2_universe")
 
 CLUSTER = "cluster"
@@ -16,27 +34,117 @@ CONNECTION = "connection"
 CONNECTIONS = "connections"
 DESTINATION = "destination"
 GALAXY = "galaxy"
+GALAXY_MACRO = "XU_EP2_universe_macro"
 MACRO = "macro"
+MACROS = "macros"
 NAME = "name"
 OFFSET = "offset"
 POSITION = "position"
 REF = "ref"
 
+# asteroid groups are per mineral and size, e.g. asteroid_ore_l
+ASTEROID_SIZES = ["l", "m", "s"]
+# how thick a field or nebula is, by resource yield
+YIELD_DENSITY = {
+    "lowest": "0.2",
+    "low": "0.4",
+    "medium": "0.6",
+    "high": "0.8",
+    "veryhigh": "1",
+}
+
+
+class MapSpec(NamedTuple):
+    """Where the keyed elements of a map file live, for diffing against the base."""
+
+    file_name: str
+    # xpath of the element holding the keyed elements
+    parent_sel: str
+    tag: str
+    # how many ancestors the keyed elements have
+    depth: int
+
+
+GALAXY_SPEC = MapSpec(
+    "galaxy.xml",
+    f"/{MACROS}/{MACRO}[@{NAME}='{GALAXY_MACRO}']/{CONNECTIONS}",
+    CONNECTION,
+    3,
+)
+CLUSTERS_SPEC = MapSpec("clusters.xml", f"/{MACROS}", MACRO, 1)
+SECTORS_SPEC = MapSpec("sectors.xml", f"/{MACROS}", MACRO, 1)
+
+
+def _c14n(elem: etree._Element) -> bytes:
+    return etree.tostring(
+        elem, method="c14n", exclusive=True, with_comments=False, with_tail=False
+    )
+
+
+def _sort_children(elem: etree._Element) -> None:
+    children = list(elem.iterchildren())
+    for child in children:
+        _sort_children(child)
+        elem.remove(child)
+    elem.extend(sorted(children, key=_c14n))
+
+
+def _canonical(elem: etree._Element) -> bytes:
+    # c14n sorts attributes, and the game doesn't care what order children come
+    # in either, so vanilla and generated elements compare equal whenever they
+    # mean the same thing
+    elem = copy.deepcopy(elem)
+    _sort_children(elem)
+    return _c14n(elem)
+
 
 class ModWriter:
-    def __init__(self, galaxy: Galaxy) -> None:
+    def __init__(
+        self, galaxy: Galaxy, *, base_maps_location: str | None = None
+    ) -> None:
         self.output_location = os.path.join(os.getcwd(), "output")
         self.galaxy = galaxy
+        # if given, write diff patches against these map files instead of
+        # replacing them outright
+        self.base_maps_location = base_maps_location
 
     def _remove_existing_output(self) -> None:
         shutil.rmtree(self.output_location)
         os.makedirs(self.output_location)
         os.makedirs(os.path.join(self.output_location, ASSETS_ENV_LOC))
+        os.makedirs(os.path.join(self.output_location, LIBRARIES_LOC))
         os.makedirs(os.path.join(self.output_location, MAPS_LOC))
 
-    def _write_galaxy_map(self) -> None:
-        root = Element("macros")
-        galaxy = Element(MACRO, attrib={NAME: "XU_EP2_universe_macro", "class": GALAXY})
+    def _build_cluster_connection(self, cluster: Cluster) -> ObjectifiedElement:
+        conn = Element(
+            CONNECTION,
+            attrib={NAME: f"{cluster.label}_{CONNECTION}", REF: CLUSTERS},
+        )
+        macro = Element(
+            MACRO, attrib={REF: f"{cluster.label}_{MACRO}", CONNECTION: GALAXY}
+        )
+        offset = Element("offset")
+        position = Element(
+            "position",
+            attrib={**cluster.position.string_dict},
+        )
+        offset.append(position)
+
+        conn.extend([macro, offset])
+        return conn
+
+    def _build_highway_connection(
+        self, hw: InterClusterConnector
+    ) -> ObjectifiedElement:
+        conn = Element(CONNECTION, attrib={NAME: hw.label, REF: DESTINATION})
+
+        macro = Element(MACRO, attrib={CONNECTION: DESTINATION})
+        conn.append(macro)
+        return conn
+
+    def _build_galaxy_map(self) -> ObjectifiedElement:
+        root = Element(MACROS)
+        galaxy = Element(MACRO, attrib={NAME: GALAXY_MACRO, "class": GALAXY})
         root.append(galaxy)
 
         galaxy.append(Element(COMPONENT, attrib={REF: "standardgalaxy"}))
@@ -44,88 +152,346 @@ class ModWriter:
         connections = Element(CONNECTIONS)
         galaxy.append(connections)
         for cluster in self.galaxy.cluster_list:
+            connections.append(self._build_cluster_connection(cluster))
+
+        for hw in self.galaxy.highways:
+            connections.append(self._build_highway_connection(hw))
+
+        return root
+
+    def _build_cluster_macro(self, cluster: Cluster) -> ObjectifiedElement:
+        macro = Element(MACRO, {NAME: f"{cluster.label}_{MACRO}", "class": CLUSTER})
+
+        component = Element(COMPONENT, {REF: "standardcluster"})
+        connections = Element(CONNECTIONS)
+        macro.extend([component, connections])
+
+        for sector in cluster.sector_list:
             conn = Element(
                 CONNECTION,
-                attrib={NAME: f"{cluster.label}_{CONNECTION}", REF: CLUSTERS},
+                {NAME: f"{sector.label}_{CONNECTION}", REF: CLUSTERS},
             )
             connections.append(conn)
-            macro = Element(
-                MACRO, attrib={REF: f"{cluster.label}_{MACRO}", CONNECTION: GALAXY}
-            )
-            offset = Element("offset")
-            position = Element(
-                "position",
-                attrib={**cluster.position.string_dict},
+
+            sector_macro = Element(
+                MACRO, {REF: f"{sector.label}_{MACRO}", CONNECTION: CLUSTER}
             )
-            offset.append(position)
+            offset = Element(OFFSET)
+            conn.extend([sector_macro, offset])
 
-            conn.extend([macro, offset])
+            pos = Element(POSITION, {**sector.position.string_dict})
+            offset.append(pos)
 
-        for hw in self.galaxy.highways:
-            conn = Element(CONNECTION, attrib={NAME: hw.label, REF: DESTINATION})
-            connections.append(conn)
+        for region in cluster.regions:
+            connections.append(self._build_region_connection(region))
 
-            macro = Element(MACRO, attrib={CONNECTION: DESTINATION})
-            conn.append(macro)
+        return macro
 
-        self._write_to_file(root, [MAPS_LOC, "galaxy.xml"])
+    def _build_region_connection(self, region: Region) -> ObjectifiedElement:
+        conn = Element(
+            CONNECTION, {NAME: f"{region.label}_{CONNECTION}", REF: "regions"}
+        )
+        offset = Element(OFFSET)
+        offset.append(Element(POSITION, {**region.position.string_dict}))
+        region_macro = Element(
+            MACRO, {NAME: f"{region.label}_{MACRO}", CONNECTION: CLUSTER}
+        )
+        region_macro.append(
+            Element(COMPONENT, {CONNECTION: CLUSTER, REF: "standardregion"})
+        )
+        properties = Element("properties")
+        properties.append(Element("region", {REF: region.definition}))
+        region_macro.append(properties)
+        conn.extend([offset, region_macro])
+        return conn
 
-    def _write_cluster_map(self) -> None:
-        root = Element("macros")
+    def _build_cluster_map(self) -> ObjectifiedElement:
+        root = Element(MACROS)
         for cluster in self.galaxy.cluster_list:
-            macro = Element(MACRO, {NAME: f"{cluster.label}_{MACRO}", "class": CLUSTER})
-            root.append(macro)
+            root.append(self._build_cluster_macro(cluster))
+        return root
 
-            component = Element(COMPONENT, {REF: "standardcluster"})
-            connections = Element(CONNECTIONS)
-            macro.extend([component, connections])
+    def _build_sector_macro(self, sector: Sector) -> ObjectifiedElement:
+        sector_macro = Element(
+            MACRO, attrib={NAME: f"{sector.label}_{MACRO}", "class": "sector"}
+        )
 
-            for sector in cluster.sector_list:
-                conn = Element(
-                    CONNECTION,
-                    {NAME: f"{sector.label}_{CONNECTION}", REF: CLUSTERS},
-                )
-                connections.append(conn)
+        sector_macro.append(Element(COMPONENT, attrib={REF: "standardsector"}))
+
+        connections = Element(CONNECTIONS)
+        sector_macro.append(connections)
+
+        # TODO zones here
+
+        return sector_macro
 
-                sector_macro = Element(
-                    MACRO, {REF: f"{sector.label}_{MACRO}", CONNECTION: CLUSTER}
+    def _build_sector_map(self) -> ObjectifiedElement:
+        root = Element(MACROS)
+        for sector in self.galaxy.sector_list:
+            root.append(self._build_sector_macro(sector))
+        return root
+
+    def _build_map_defaults(self, territory: Territory) -> ObjectifiedElement:
+        """Sector ownership, as `libraries/mapdefaults.xml` datasets."""
+        root = Element("defaults")
+        owners = territory.sector_owners
+        for sector in territory.sectors:
+            owner = owners[sector.compound_id]
+            if owner is None:
+                continue
+            dataset = Element("dataset", {MACRO: f"{sector.label}_{MACRO}"})
+            properties = Element("properties")
+            properties.append(Element("owner", {"faction": owner}))
+            dataset.append(properties)
+            root.append(dataset)
+        return root
+
+    def _write_map_defaults(self) -> None:
+        if self.galaxy.territory is None:
+            return
+        root = self._build_map_defaults(self.galaxy.territory)
+        if self.base_maps_location is not None:
+            # vanilla has datasets for some of the same sectors, so clear those
+            # out first. silent since most of ours won't be there
+            diff = Element("diff")
+            for dataset in root.iterchildren("dataset"):
+                diff.append(
+                    Element(
+                        "remove",
+                        {
+                            "sel": f"/defaults/dataset[@{MACRO}='{dataset.get(MACRO)}']",
+                            "silent": "true",
+                        },
+                    )
                 )
-                offset = Element(OFFSET)
-                conn.extend([sector_macro, offset])
+            add = Element("add", {"sel": "/defaults"})
+            add.extend(list(root.iterchildren("dataset")))
+            diff.append(add)
+            root = diff
+        self._write_to_file(root, [LIBRARIES_LOC, "mapdefaults.xml"])
 
-                pos = Element(POSITION, {**sector.position.string_dict})
-                offset.append(pos)
+    def _build_region_definitions(self) -> ObjectifiedElement:
+        """The shape and resources of every region, for
+        `libraries/region_definitions.xml`."""
+        root = Element("regions")
+        for cluster in self.galaxy.cluster_list:
+            for region in cluster.regions:
+                definition = Element("region", {NAME: region.definition})
+                boundary = Element("boundary", {"class": "cylinder"})
+                boundary.append(
+                    Element("size", {"r": str(region.radius), "linear": "5000"})
+                )
+                resources = Element("resources")
+                for ware in region.resources:
+                    resources.append(
+                        Element(
+                            "resource",
+                            {"ware": ware, "yield": region.resource_yield},
+                        )
+                    )
+                definition.extend(
+                    [boundary, self._build_region_fields(region), resources]
+                )
+                root.append(definition)
+        return root
 
-            # TODO connect regions here
+    def _build_region_fields(self, region: Region) -> ObjectifiedElement:
+        """What a region looks like: gas clouds for a nebula, asteroids of each
+        size for a field. Both get thicker the better the yield."""
+        fields = Element("fields")
+        density = YIELD_DENSITY[region.resource_yield]
+        for ware in region.resources:
+            if region.nebula:
+                fields.append(
+                    Element(
+                        "volumetricfog",
+                        {
+                            "medium": f"fog_{ware}_nebula",
+                            "lodrule": "nebula",
+                            "densityfactor": density,
+                        },
+                    )
+                )
+                continue
+            for size in ASTEROID_SIZES:
+                fields.append(
+                    Element(
+                        "asteroid",
+                        {
+                            "groupref": f"asteroid_{ware}_{size}",
+                            "densityfactor": density,
+                        },
+                    )
+                )
+        return fields
 
-        self._write_to_file(root, [MAPS_LOC, "clusters.xml"])
+    def _write_region_definitions(self) -> None:
+        root = self._build_region_definitions()
+        if self.base_maps_location is not None:
+            # our definitions all have their own names, so they only ever add
+            diff = Element("diff")
+            add = Element("add", {"sel": "/regions"})
+            add.extend(list(root.iterchildren("region")))
+            diff.append(add)
+            root = diff
+        self._write_to_file(root, [LIBRARIES_LOC, "region_definitions.xml"])
 
-    def _write_sector_map(self) -> None:
-        root = Element("macros")
-        for sector in self.galaxy.sector_list:
-            sector_macro = Element(
-                MACRO, attrib={NAME: f"{sector.label}_{MACRO}", "class": "sector"}
-            )
-            root.append(sector_macro)
+    def _index_base_map(self, spec: MapSpec) -> dict[str, bytes]:
+        """Stream the base map file once, keeping only the canonical form of each
+        keyed element by name."""
+        index: dict[str, bytes] = {}
+        path = os.path.join(cast(str, self.base_maps_location), spec.file_name)
+        for _, elem in etree.iterparse(
+            path, events=("end",), tag=spec.tag, remove_blank_text=True
+        ):
+            # nested elements with the same tag are part of a keyed element,
+            # so they have to stay around until it's done
+            if sum(1 for _ in elem.iterancestors()) != spec.depth:
+                continue
+            index[elem.get(NAME, "")] = _canonical(elem)
+            release_element(elem)
+        return index
 
-            sector_macro.append(Element(COMPONENT, attrib={REF: "standardsector"}))
+    def _imported_names(self, spec: MapSpec) -> set[str]:
+        """Names of the base map's elements for everything we imported and haven't
+        changed since. We only read part of those, so they're left as they are."""
+        clusters = [x for x in self.galaxy.cluster_list if x.imported]
+        if spec == GALAXY_SPEC:
+            return {f"{x.label}_{CONNECTION}" for x in clusters} | {
+                hw.label for hw in self.galaxy.highways if hw.imported
+            }
+        if spec == CLUSTERS_SPEC:
+            return {f"{x.label}_{MACRO}" for x in clusters}
+        if spec == SECTORS_SPEC:
+            return {f"{x.label}_{MACRO}" for c in clusters for x in c.sector_list}
+        return set()
 
-            connections = Element(CONNECTIONS)
-            sector_macro.append(connections)
+    def _build_diff(
+        self, root: ObjectifiedElement, spec: MapSpec
+    ) -> ObjectifiedElement:
+        """Turn a full map into the `<add>`/`<replace>`/`<remove>` operations that
+        take the base map to it."""
+        deannotate(root, cleanup_namespaces=True)
+        base = self._index_base_map(spec)
+        imported = self._imported_names(spec)
+        for name in imported:
+            base.pop(name, None)
+        parent = root.xpath(spec.parent_sel)[0]
 
-            # TODO zones here
+        diff = Element("diff")
+        additions: list[etree._Element] = []
+        for elem in list(parent.iterchildren(spec.tag)):
+            name = elem.get(NAME, "")
+            if name in imported:
+                continue
+            base_elem = base.pop(name, None)
+            if base_elem is None:
+                additions.append(elem)
+            elif base_elem != _canonical(elem):
+                replace = Element(
+                    "replace",
+                    attrib={"sel": f"{spec.parent_sel}/{spec.tag}[@{NAME}='{name}']"},
+                )
+                replace.append(elem)
+                diff.append(replace)
+        if len(additions) > 0:
+            add = Element("add", attrib={"sel": spec.parent_sel})
+            add.extend(additions)
+            diff.append(add)
+        # anything left in the base wasn't generated
+        for name in base:
+            diff.append(
+                Element(
+                    "remove",
+                    attrib={"sel": f"{spec.parent_sel}/{spec.tag}[@{NAME}='{name}']"},
+                )
+            )
+        return diff
 
-        self._write_to_file(root, [MAPS_LOC, "sectors.xml"])
+    def _write_map(self, root: ObjectifiedElement, spec: MapSpec) -> None:
+        if self.base_maps_location is not None:
+            root = self._build_diff(root, spec)
+        self._write_to_file(root, [MAPS_LOC, spec.file_name])
 
     def _write_to_file(self, root: ObjectifiedElement, path: list[str]) -> None:
-        deannotate(root)
+        deannotate(root, cleanup_namespaces=True)
         xml = etree.tostring(root, pretty_print=True, xml_declaration=True)
 
         with open(os.path.join(self.output_location, *path), "w") as file:
             file.write(xml.decode("utf-8"))
 
+    def _update_map(
+        self,
+        spec: MapSpec,
+        removed: list[str],
+        updated: list[ObjectifiedElement],
+    ) -> None:
+        """Swap individual keyed elements of a map we've already written."""
+        path = os.path.join(self.output_location, MAPS_LOC, spec.file_name)
+        parser = etree.XMLParser(remove_blank_text=True)
+        root = etree.parse(path, parser).getroot()
+        parent = root.xpath(spec.parent_sel)[0]
+        existing = {elem.get(NAME): elem for elem in parent.iterchildren(spec.tag)}
+
+        for name in removed:
+            if name in existing:
+                parent.remove(existing.pop(name))
+        for elem in updated:
+            deannotate(elem, cleanup_namespaces=True)
+            old = existing.get(elem.get(NAME))
+            if old is None:
+                parent.append(elem)
+            else:
+                parent.replace(old, elem)
+        self._write_to_file(root, [MAPS_LOC, spec.file_name])
+
+    def update(self, changes: ChangeSet) -> None:
+        """Apply a localized edit to the maps from an earlier `write`, only
+        rebuilding the elements it touched."""
+        if self.base_maps_location is not None:
+            # diffs are against the base game, so there's nothing to patch in place
+            self.write()
+            return
+        self._update_map(
+            GALAXY_SPEC,
+            changes.removed_highways,
+            [self._build_cluster_connection(x) for x in changes.clusters]
+            + [self._build_highway_connection(x) for x in changes.highways],
+        )
+        self._update_map(
+            CLUSTERS_SPEC,
+            [],
+            [self._build_cluster_macro(x) for x in changes.clusters],
+        )
+        self._update_map(
+            SECTORS_SPEC,
+            [f"{x}_{MACRO}" for x in changes.removed_sectors],
+            [self._build_sector_macro(x) for x in changes.sectors],
+        )
+        # these are small, and a new cluster can change any of them
+        self._write_map_defaults()
+        self._write_region_definitions()
+
     def write(self) -> None:
         self._remove_existing_output()
-        self._write_galaxy_map()
-        self._write_cluster_map()
-        self._write_sector_map()
+        self._write_map(self._build_galaxy_map(), GALAXY_SPEC)
+        self._write_map(self._build_cluster_map(), CLUSTERS_SPEC)
+        self._write_map(self._build_sector_map(), SECTORS_SPEC)
+        self._write_map_defaults()
+        self._write_region_definitions()
+
+    def validate(self, *, processes: int | None = None) -> None:
+        """Check the written maps and libraries against the bundled schemas, so
+        broken XML turns up here rather than when the game loads the mod."""
+        diff = self.base_maps_location is not None
+        maps_location = os.path.join(self.output_location, MAPS_LOC)
+        libraries_location = os.path.join(self.output_location, LIBRARIES_LOC)
+        errors = validate_files(
+            map_jobs(maps_location, diff=diff)
+            + library_jobs(libraries_location, diff=diff),
+            processes=processes,
+        )
+        if len(errors) > 0:
+            raise ModValidationException(
+                "Invalid mod files:\n" + "\n".join(str(x) for x in errors)
+            )
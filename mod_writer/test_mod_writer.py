@@ -0,0 +1,114 @@
+import os
+
+from lxml import etree
+from lxml.objectify import deannotate
+
+from generator.sectors.models import ChangeSet, Cluster, Galaxy, Position, Sector
+from mod_writer.mod_writer import (
+    CLUSTERS_SPEC,
+    GALAXY_SPEC,
+    MAPS_LOC,
+    SECTORS_SPEC,
+    ModWriter,
+)
+
+
+def galaxy_factory() -> Galaxy:
+    clusters = {
+        i: Cluster(
+            id=i,
+            sectors={1: Sector(id=1, position=Position(i * 1_000, 0, 0), cluster_id=i)},
+        )
+        for i in range(1, 3)
+    }
+    return Galaxy(clusters=clusters, highways=[])
+
+
+def test_cluster_map_diff(tmp_path) -> None:
+    """Unchanged macros are left alone, changed ones are replaced, new ones are
+    added and ones we didn't generate are removed."""
+    base = ModWriter(galaxy_factory())._build_cluster_map()
+    deannotate(base, cleanup_namespaces=True)
+    base_xml = etree.tostring(base).decode("utf-8")
+    # pretend cluster 2 sat somewhere else in the base game
+    base_xml = base_xml.replace('x="2000"', 'x="9000"')
+    base_xml = base_xml.replace(
+        "</macros>", '<macro name="Cluster_05_macro" class="cluster"/></macros>'
+    )
+    with open(os.path.join(tmp_path, "clusters.xml"), "w") as file:
+        file.write(base_xml)
+
+    galaxy = galaxy_factory()
+    galaxy.clusters[3] = Cluster(
+        id=3, sectors={1: Sector(id=1, position=Position(0, 0, 0), cluster_id=3)}
+    )
+    writer = ModWriter(galaxy, base_maps_location=str(tmp_path))
+    diff = writer._build_diff(writer._build_cluster_map(), CLUSTERS_SPEC)
+
+    ops = list(diff.iterchildren())
+    assert [(op.tag, op.get("sel")) for op in ops] == [
+        ("replace", "/macros/macro[@name='Cluster_02_macro']"),
+        ("add", "/macros"),
+        ("remove", "/macros/macro[@name='Cluster_05_macro']"),
+    ]
+    assert [x.get("name") for x in ops[1].iterchildren()] == ["Cluster_03_macro"]
+
+
+def test_galaxy_map_diff_no_changes(tmp_path) -> None:
+    base = ModWriter(galaxy_factory())._build_galaxy_map()
+    deannotate(base, cleanup_namespaces=True)
+    with open(os.path.join(tmp_path, "galaxy.xml"), "w") as file:
+        file.write(etree.tostring(base, pretty_print=True).decode("utf-8"))
+
+    writer = ModWriter(galaxy_factory(), base_maps_location=str(tmp_path))
+    diff = writer._build_diff(writer._build_galaxy_map(), GALAXY_SPEC)
+    assert len(list(diff.iterchildren())) == 0, "Identical maps produce an empty patch"
+
+
+def test_update_from_change_set(tmp_path) -> None:
+    galaxy = galaxy_factory()
+    writer = ModWriter(galaxy)
+    writer.output_location = str(tmp_path)
+    writer.write()
+
+    galaxy.clusters[2].sectors = {
+        1: Sector(id=1, position=Position(5_000, 0, 0), cluster_id=2),
+        2: Sector(id=2, position=Position(7_000, 0, 0), cluster_id=2),
+    }
+    writer.update(
+        ChangeSet(
+            clusters=[galaxy.clusters[2]],
+            sectors=galaxy.clusters[2].sector_list,
+            removed_sectors=[],
+            highways=[],
+            removed_highways=[],
+        )
+    )
+
+    expected = ModWriter(galaxy)
+    for spec, build in [
+        (GALAXY_SPEC, expected._build_galaxy_map),
+        (CLUSTERS_SPEC, expected._build_cluster_map),
+        (SECTORS_SPEC, expected._build_sector_map),
+    ]:
+        root = build()
+        deannotate(root, cleanup_namespaces=True)
+        written = etree.parse(
+            os.path.join(tmp_path, MAPS_LOC, spec.file_name),
+            etree.XMLParser(remove_blank_text=True),
+        )
+        assert etree.tostring(written.getroot()) == etree.tostring(root)
+
+
+def test_diff_ignores_child_order(tmp_path) -> None:
+    base = ModWriter(galaxy_factory())._build_galaxy_map()
+    deannotate(base, cleanup_namespaces=True)
+    # vanilla puts the offset before the macro
+    for conn in base.iter("connection"):
+        conn.insert(0, conn.find("offset"))
+    with open(os.path.join(tmp_path, "galaxy.xml"), "w") as file:
+        file.write(etree.tostring(base, pretty_print=True).decode("utf-8"))
+
+    writer = ModWriter(galaxy_factory(), base_maps_location=str(tmp_path))
+    diff = writer._build_diff(writer._build_galaxy_map(), GALAXY_SPEC)
+    assert len(list(diff.iterchildren())) == 0
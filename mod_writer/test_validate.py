@@ -0,0 +1,101 @@
+import os
+import shutil
+
+import pytest
+
+from config.models import Config, RegionSettings
+from generator.sectors.generator import SectorGenerator
+from generator.sectors.models import Galaxy
+from mod_writer.mod_writer import LIBRARIES_LOC, MAPS_LOC, ModWriter
+from mod_writer.validate import (
+    ModValidationException,
+    library_jobs,
+    validate_files,
+    validate_maps,
+)
+
+
+def write_galaxy(location: str, **kwargs) -> ModWriter:
+    galaxy = Galaxy(clusters={}, highways=[])
+    SectorGenerator(
+        Config(
+            sector_count=20,
+            factions=["argon", "teladi"],
+            regions=RegionSettings(asteroid_threshold=0),
+        ),
+        galaxy,
+    ).generate()
+    writer = ModWriter(galaxy, **kwargs)
+    writer.output_location = location
+    os.makedirs(location, exist_ok=True)
+    writer.write()
+    return writer
+
+
+def test_written_maps_are_valid(tmp_path) -> None:
+    writer = write_galaxy(str(tmp_path / "output"))
+    writer.validate()
+    # the pool has to come to the same answer
+    assert (
+        validate_maps(os.path.join(writer.output_location, MAPS_LOC), processes=2) == []
+    )
+
+
+def test_diff_maps_are_valid(tmp_path) -> None:
+    base = write_galaxy(str(tmp_path / "base"))
+    writer = write_galaxy(
+        str(tmp_path / "output"),
+        base_maps_location=os.path.join(base.output_location, MAPS_LOC),
+    )
+    writer.validate()
+
+
+def test_broken_maps_are_reported(tmp_path) -> None:
+    writer = write_galaxy(str(tmp_path / "output"))
+    maps_location = os.path.join(writer.output_location, MAPS_LOC)
+    path = os.path.join(maps_location, "clusters.xml")
+    with open(path) as file:
+        xml = file.read()
+    with open(path, "w") as file:
+        file.write(xml.replace('y="0"', 'y="up"', 1).replace(' ref="clusters"', "", 1))
+
+    errors = validate_maps(maps_location)
+    assert {error.path for error in errors} == {path}
+    assert len(errors) == 2, "Every error in the file is reported, not just the first"
+    with pytest.raises(ModValidationException):
+        writer.validate()
+
+    shutil.copy(path, os.path.join(maps_location, "sectors.xml"))
+    assert len(validate_maps(maps_location, processes=2)) == 4
+
+
+def test_broken_libraries_are_reported(tmp_path) -> None:
+    base = write_galaxy(str(tmp_path / "base"))
+    for writer in [
+        write_galaxy(str(tmp_path / "output")),
+        write_galaxy(
+            str(tmp_path / "diff"),
+            base_maps_location=os.path.join(base.output_location, MAPS_LOC),
+        ),
+    ]:
+        libraries_location = os.path.join(writer.output_location, LIBRARIES_LOC)
+        jobs = library_jobs(
+            libraries_location, diff=writer.base_maps_location is not None
+        )
+        assert len(jobs) == 2
+        breaks = {
+            "mapdefaults.xml": ('faction="', 'faction="no such faction'),
+            "region_definitions.xml": ('<boundary class="cylinder">', "<boundary>"),
+        }
+        for file_name, (old, new) in breaks.items():
+            path = os.path.join(libraries_location, file_name)
+            with open(path) as file:
+                xml = file.read()
+            assert old in xml
+            with open(path, "w") as file:
+                file.write(xml.replace(old, new, 1))
+
+        errors = validate_files(jobs)
+        assert sorted(os.path.basename(x.path) for x in errors) == sorted(breaks)
+        with pytest.raises(ModValidationException):
+            writer.validate()
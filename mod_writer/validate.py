@@ -0,0 +1,134 @@
+import os
+from multiprocessing import Pool
+from typing import NamedTuple
+
+from lxml import etree
+
+from xml_helpers import release_element
+
+SCHEMAS_LOC = os.path.join(os.path.dirname(__file__), "schemas")
+MACROS_SCHEMA = "macros.xsd"
+DIFF_SCHEMA = "diff.xsd"
+
+# map files we write, in the order they're written. zone files go here once
+# sectors have zones
+MAP_FILES = ["galaxy.xml", "clusters.xml", "sectors.xml"]
+
+# library files we write, with their schemas written out whole and as a diff.
+# mapdefaults.xml is only there once factions have territory
+LIBRARY_SCHEMAS = {
+    "mapdefaults.xml": ("mapdefaults.xsd", "mapdefaults_diff.xsd"),
+    "region_definitions.xml": (
+        "region_definitions.xsd",
+        "region_definitions_diff.xsd",
+    ),
+}
+
+# below this, starting a pool takes longer than validating everything here
+PARALLEL_MIN_BYTES = 4_000_000
+
+# compiled schemas by file name and modification time. lxml schemas can't be
+# pickled, so this lasts as long as the process does, and pool workers forked
+# after a schema was compiled start out with it already
+_schema_cache: dict[tuple[str, float], etree.XMLSchema] = {}
+
+
+class ModValidationException(Exception):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class ValidationError(NamedTuple):
+    # no line numbers, libxml2 doesn't track them when validating a stream
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}"
+
+
+def load_schema(schema_name: str) -> etree.XMLSchema:
+    """Compile one of the bundled schemas, or reuse it if it's been compiled by
+    this process before and hasn't changed since."""
+    path = os.path.join(SCHEMAS_LOC, schema_name)
+    key = (schema_name, os.path.getmtime(path))
+    if key not in _schema_cache:
+        _schema_cache[key] = etree.XMLSchema(etree.parse(path))
+    return _schema_cache[key]
+
+
+def validate_file(path: str, schema_name: str) -> list[ValidationError]:
+    """Validate while streaming the file, freeing elements as soon as they're
+    done, so memory doesn't grow with the size of the map."""
+    events = etree.iterparse(path, events=("end",), schema=load_schema(schema_name))
+    try:
+        for _, elem in events:
+            release_element(elem)
+    except etree.XMLSyntaxError as e:
+        # parsing carries on past schema errors, so this parse's log has all of
+        # them. the exception's log is shared with earlier parses
+        return [ValidationError(path, x.message) for x in events.error_log] or [
+            ValidationError(path, e.msg)
+        ]
+    return []
+
+
+def _validate_job(job: tuple[str, str]) -> list[ValidationError]:
+    return validate_file(*job)
+
+
+def validate_files(
+    jobs: list[tuple[str, str]], *, processes: int | None = None
+) -> list[ValidationError]:
+    """Check each file against the bundled schema it's paired with.
+
+    Files are spread over a process pool once there's enough XML to make that
+    worth it, or whenever `processes` asks for more than one."""
+    # compiled here first so forked workers get them for free
+    for schema_name in {schema_name for _, schema_name in jobs}:
+        load_schema(schema_name)
+    total_size = sum(os.path.getsize(path) for path, _ in jobs)
+    if processes is None and total_size < PARALLEL_MIN_BYTES:
+        processes = 1
+    if processes == 1 or len(jobs) <= 1:
+        results = [_validate_job(job) for job in jobs]
+    else:
+        with Pool(min(processes or len(jobs), len(jobs))) as pool:
+            results = pool.map(_validate_job, jobs)
+    return [error for errors in results for error in errors]
+
+
+def map_jobs(
+    maps_location: str, *, diff: bool = False, file_names: list[str] | None = None
+) -> list[tuple[str, str]]:
+    schema_name = DIFF_SCHEMA if diff else MACROS_SCHEMA
+    return [
+        (os.path.join(maps_location, file_name), schema_name)
+        for file_name in file_names or MAP_FILES
+    ]
+
+
+def library_jobs(
+    libraries_location: str, *, diff: bool = False
+) -> list[tuple[str, str]]:
+    """The library files that were written, since not all of them always are."""
+    jobs = []
+    for file_name, (schema_name, diff_schema_name) in LIBRARY_SCHEMAS.items():
+        path = os.path.join(libraries_location, file_name)
+        if os.path.exists(path):
+            jobs.append((path, diff_schema_name if diff else schema_name))
+    return jobs
+
+
+def validate_maps(
+    maps_location: str,
+    *,
+    diff: bool = False,
+    file_names: list[str] | None = None,
+    processes: int | None = None,
+) -> list[ValidationError]:
+    """Check the map files in `maps_location` against the bundled schemas."""
+    return validate_files(
+        map_jobs(maps_location, diff=diff, file_names=file_names),
+        processes=processes,
+    )
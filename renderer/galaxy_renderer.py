@@ -0,0 +1,152 @@
+import math
+import os
+import random
+from multiprocessing import Pool
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
+
+from config.models import Config
+from generator.sectors.generator import SectorGenerator
+from generator.sectors.models import Galaxy
+from generator.sectors.scoring import SeedRejectedException
+
+# hex centres sit `radius` apart across an edge, so the corners are at
+# radius / sqrt(3), every 60 degrees starting from the x axis
+HEX_CORNERS = np.stack(
+    [
+        np.cos(np.radians(np.arange(0, 360, 60))),
+        np.sin(np.radians(np.arange(0, 360, 60))),
+    ],
+    axis=-1,
+) / math.sqrt(3)
+
+BACKGROUND = "#0b0e1a"
+CLUSTER_HIGHWAY_COLOR = "#f2c14e"
+SECTOR_HIGHWAY_COLOR = "#7fdbff"
+
+
+def sector_arrays(galaxy: Galaxy) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flatten the galaxy's sectors into (x, z) centres, hex radii and cluster ids."""
+    sectors = galaxy.sector_list
+    centers = np.array(
+        [(sec.position.x, sec.position.z) for sec in sectors], dtype=float
+    ).reshape(-1, 2)
+    radii = np.array([sec.hex.radius for sec in sectors], dtype=float)
+    cluster_ids = np.array([sec.cluster_id for sec in sectors], dtype=int)
+    return centers, radii, cluster_ids
+
+
+def hex_vertices(centers: np.ndarray, radii: np.ndarray) -> np.ndarray:
+    """Corners of every hex at once, shaped (sectors, 6, 2)."""
+    return centers[:, None, :] + radii[:, None, None] * HEX_CORNERS[None, :, :]
+
+
+def highway_segments(galaxy: Galaxy) -> tuple[np.ndarray, np.ndarray]:
+    """Start and end points of the jump gate and in-cluster highways, each shaped
+    (highways, 2, 2)."""
+    cluster_highways = np.array(
+        [
+            [
+                (
+                    hw.entry_point.sector.position.x + hw.entry_point.position.x,
+                    hw.entry_point.sector.position.z + hw.entry_point.position.z,
+                ),
+                (
+                    hw.exit_point.sector.position.x + hw.exit_point.position.x,
+                    hw.exit_point.sector.position.z + hw.exit_point.position.z,
+                ),
+            ]
+            for hw in galaxy.highways
+        ],
+        dtype=float,
+    ).reshape(-1, 2, 2)
+    sector_highways = np.array(
+        [
+            [
+                (hw.entry_point.sector.position.x, hw.entry_point.sector.position.z),
+                (hw.exit_point.sector.position.x, hw.exit_point.sector.position.z),
+            ]
+            for cluster in galaxy.cluster_list
+            for hw in cluster.inter_sector_highways
+        ],
+        dtype=float,
+    ).reshape(-1, 2, 2)
+    return cluster_highways, sector_highways
+
+
+def render_galaxy(
+    galaxy: Galaxy, path: str, *, size: float = 10.0, dpi: int = 100
+) -> None:
+    """Draw the galaxy to `path`, with the format picked from its extension.
+
+    All hexes go into a single `PolyCollection` and each kind of highway into a
+    single `LineCollection`, so drawing cost barely grows with galaxy size."""
+    centers, radii, cluster_ids = sector_arrays(galaxy)
+    cluster_highways, sector_highways = highway_segments(galaxy)
+
+    # no pyplot here, so nothing needs a display and batches can run in parallel
+    figure = Figure(figsize=(size, size), dpi=dpi, facecolor=BACKGROUND)
+    FigureCanvasAgg(figure)
+    axes = figure.add_axes((0, 0, 1, 1))
+    axes.set_facecolor(BACKGROUND)
+    axes.set_axis_off()
+    axes.set_aspect("equal")
+
+    hexes = PolyCollection(
+        hex_vertices(centers, radii),
+        array=cluster_ids % 20,
+        cmap="tab20",
+        edgecolors=BACKGROUND,
+        linewidths=0.5,
+    )
+    hexes.set_clim(0, 19)
+    axes.add_collection(hexes)
+    axes.add_collection(
+        LineCollection(sector_highways, colors=SECTOR_HIGHWAY_COLOR, linewidths=0.8)
+    )
+    axes.add_collection(
+        LineCollection(cluster_highways, colors=CLUSTER_HIGHWAY_COLOR, linewidths=1.2)
+    )
+
+    if len(centers) > 0:
+        margin = radii.max()
+        axes.set_xlim(centers[:, 0].min() - margin, centers[:, 0].max() + margin)
+        axes.set_ylim(centers[:, 1].min() - margin, centers[:, 1].max() + margin)
+
+    figure.savefig(path, facecolor=BACKGROUND)
+
+
+def _render_seed(args: tuple[Config, int, str]) -> str | None:
+    config, seed, path = args
+    random.seed(seed)
+    galaxy = Galaxy(clusters={}, highways=[])
+    try:
+        SectorGenerator(config, galaxy).generate()
+    except SeedRejectedException:
+        return None
+    render_galaxy(galaxy, path)
+    return path
+
+
+def render_seeds(
+    config: Config,
+    seeds: list[int],
+    output_location: str,
+    *,
+    file_format: str = "png",
+    processes: int | None = None,
+) -> list[str]:
+    """Generate and render a galaxy for every seed, spread over a process pool.
+    Returns the paths of the rendered images. Seeds that don't meet the quality
+    thresholds are skipped."""
+    os.makedirs(output_location, exist_ok=True)
+    jobs = [
+        (config, seed, os.path.join(output_location, f"galaxy_{seed}.{file_format}"))
+        for seed in seeds
+    ]
+    with Pool(processes) as pool:
+        paths = pool.map(_render_seed, jobs)
+    return [path for path in paths if path is not None]
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+from config.models import Config, QualityThresholds
+from generator.sectors.models import Cluster, Galaxy, Position, Sector
+from renderer.galaxy_renderer import (
+    hex_vertices,
+    render_galaxy,
+    render_seeds,
+    sector_arrays,
+)
+
+
+def test_hex_vertices() -> None:
+    """Neighbouring hexes share an edge."""
+    radius = 250_000
+    centers = np.array([[0, 0], [0, radius]], dtype=float)
+    verts = hex_vertices(centers, np.full(2, radius, dtype=float))
+    assert verts.shape == (2, 6, 2)
+    shared = {tuple(np.round(v)) for v in verts[0]} & {
+        tuple(np.round(v)) for v in verts[1]
+    }
+    assert len(shared) == 2
+
+
+def test_render_galaxy(tmp_path) -> None:
+    cluster = Cluster(
+        id=1,
+        sectors={
+            1: Sector(id=1, position=Position(0, 0, 0), cluster_id=1),
+            2: Sector(id=2, position=Position(0, 0, 250_000), cluster_id=1),
+        },
+    )
+    galaxy = Galaxy(clusters={1: cluster}, highways=[])
+    centers, _, cluster_ids = sector_arrays(galaxy)
+    assert centers.shape == (2, 2)
+    assert list(cluster_ids) == [1, 1]
+
+    for file_name in ["galaxy.png", "galaxy.svg"]:
+        path = os.path.join(tmp_path, file_name)
+        render_galaxy(galaxy, path)
+        assert os.path.getsize(path) > 0
+
+
+def test_render_seeds(tmp_path) -> None:
+    paths = render_seeds(Config(sector_count=20), [1, 2], str(tmp_path), processes=2)
+    assert [os.path.basename(x) for x in paths] == ["galaxy_1.png", "galaxy_2.png"]
+    assert all([os.path.exists(x) for x in paths])
+
+
+def test_render_seeds_skips_rejected(tmp_path) -> None:
+    # 0 single-sector clusters allowed only passes by luck, so at most some of
+    # these get rendered, and the rest mustn't take the batch down with them
+    config = Config(
+        sector_count=30, quality=QualityThresholds(max_single_sector_cluster_ratio=0)
+    )
+    paths = render_seeds(config, list(range(6)), str(tmp_path), processes=2)
+    assert len(paths) < 6
+    assert all([os.path.exists(x) for x in paths])
@@ -0,0 +1,13 @@
+from lxml import etree
+
+
+def release_element(elem: etree._Element) -> None:
+    """Free an element we're done with, plus everything that came before it,
+    so the tree iterparse is building never grows past the current element."""
+    elem.clear()
+    for node in [elem, *elem.iterancestors()]:
+        parent = node.getparent()
+        if parent is None:
+            break
+        while node.getprevious() is not None:
+            del parent[0]